@@ -1,44 +1,311 @@
 from __future__ import annotations
-from typing import List, Tuple, Dict
+from typing import Any, List, Optional, Sequence, Tuple, Dict
 import math
-from .env import Engine
-from .utils import encode_action
+import time
+import numpy as np
+from .env import Engine, PIECE_VAL
+from .game_state import PIECE_MASK, SOUTH
+from .movegen import Action
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER
+from .utils import DIMS, encode_action
 
 # Very simple greedy agent that scores actions by immediate material delta.
 # Values are taken from YAML semantics: R(5) > N(3)=B(3) > Q(4 as utility) > P(1). King is priceless.
 
 VAL = {"P":1,"N":3,"B":3,"R":5,"Q":4,"K":1000}
+_PIECE_VALUES = np.array(PIECE_VAL, dtype=np.int64)
 
 def score_action(engine: Engine, action: Tuple[int,int,int,int,int,int]) -> float:
-    # Apply action on a copy: very rough one-ply evaluation
-    import copy
-    e2 = copy.deepcopy(engine)
-    before = material(e2)
+    # Apply action, measure, then undo: very rough one-ply evaluation
+    side = engine.state.to_move
+    opp = "south" if side == "north" else "north"
+    before = material(engine)
     try:
-        e2.apply(action)
+        rec = engine.apply(action, events=False)
     except Exception:
         return -math.inf
-    after = material(e2)
-    # greedy prefers increasing our material vs opponent's
-    side_played = "south" if engine.state.to_move == "north" else "north"  # after apply, side swapped
+    after = material(engine)
+    engine.undo(rec)
     # score as (our - their) delta for the acting side
-    return (after[engine.state.to_move] - after[side_played]) - (before[engine.state.to_move] - before[side_played])
+    return (after[side] - after[opp]) - (before[side] - before[opp])
+
+def score_actions(engine: Engine, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """``score_action`` for many flat action indices at once (the legal actions by default).
+
+    Outcomes come straight from the combat tables, as in ``Engine.predict_outcome``, so nothing
+    is applied: melee uses the compiled melee table, a shot kills the target's top unit and a
+    conversion moves its value to the mover.
+    """
+    if indices is None:
+        indices = engine.legal_action_indices()
+    fr, fc, slot, atype, tr, tc = np.unravel_index(indices, DIMS)
+    cols = engine.state.board.cols
+    cells = np.frombuffer(engine.state.board.cells, dtype=np.uint8)
+    si = 2 * (fr * cols + fc)
+    di = 2 * (tr * cols + tc)
+    u = cells[si + slot]
+    top = cells[di]
+    bottom = cells[di + 1]
+    up, tp, bp = u & PIECE_MASK, top & PIECE_MASK, bottom & PIECE_MASK
+    val = _PIECE_VALUES
+    flags = engine.combat.melee_array[up, tp, bp]
+    att_alive, top_alive, bottom_alive = flags[:, 0], flags[:, 1], flags[:, 2]
+    melee, ranged, convert = atype == 1, atype == 2, atype == 3
+    # a killed bottom unit may be the mover's own (stacks can hold both sides)
+    bottom_killed = melee & (bottom != 0) & ~bottom_alive
+    bottom_own = (bottom & SOUTH) == (u & SOUTH)
+    # a melee attacker dies or finds no free slot
+    opp_loss = (val[tp] * ((melee & ~top_alive) | ranged)
+                + val[bp] * (bottom_killed & ~bottom_own)
+                + val[tp] * convert)
+    own_loss = (val[up] * (melee & (~att_alive | (top_alive & (bottom != 0) & bottom_alive)))
+                + val[bp] * (bottom_killed & bottom_own)
+                - val[tp] * convert)
+    return opp_loss - own_loss
 
 def material(engine: Engine) -> Dict[str,int]:
-    tot = {"north":0,"south":0}
-    for r in range(engine.state.board.rows):
-        for c in range(engine.state.board.cols):
-            sq = engine.state.board.grid[r][c]
-            for u in [sq.top, sq.bottom]:
-                if u:
-                    tot[u.side] += VAL.get(u.code,0)
-    return tot
+    return engine._material()
 
 class GreedyAgent:
     def select(self, engine: Engine):
         legal = engine.legal_actions()
         if not legal:
             return None
-        scored = [(score_action(engine, a), a) for a in legal]
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return scored[0][1]
+        # first best in legal order, like a stable sort by score
+        return legal[int(np.argmax(score_actions(engine)))]
+
+
+# Search scores are material from the side to move's point of view; a won game is worth WIN minus
+# the plies it takes, so faster wins (and slower losses) are preferred.
+WIN = 1_000_000
+_MATE_BOUND = WIN - 10_000
+
+
+class _SearchAbort(Exception):
+    pass
+
+
+class SearchAgent:
+    """Negamax alpha-beta over ``Engine.apply``/``undo`` with iterative deepening.
+
+    Moves are ordered transposition-table move first, then material-winning captures, ranged kills
+    and conversions (by ``Engine.predict_outcome``), then killer moves. At the horizon, captures
+    are searched for up to ``quiescence`` more plies. Each move is bounded by ``max_depth`` and by
+    ``time_limit`` seconds and/or ``node_limit`` nodes; the deepest completed iteration decides.
+    ``stats`` describes the last search (depth reached, nodes, nodes per second, score, and the
+    best move and score of each completed iteration).
+    """
+
+    def __init__(self, max_depth: int = 6, time_limit: Optional[float] = 0.2,
+                 node_limit: Optional[int] = None, quiescence: int = 2, tt_bits: int = 16,
+                 reuse_tt: bool = True):
+        if max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.quiescence = quiescence
+        self.tt = TranspositionTable(tt_bits)
+        # False clears the table (not its counters) before every search, so a move depends only
+        # on its position
+        self.reuse_tt = reuse_tt
+        self.stats: Dict[str, Any] = {}
+        self._killers: List[List[Optional[Action]]] = []
+
+    def select(self, engine: Engine) -> Optional[Action]:
+        return self.search(engine)[0]
+
+    def search(self, engine: Engine, root_actions: Optional[Sequence[Action]] = None) -> Tuple[Optional[Action], int]:
+        """Best action for the side to move and its score, searching only ``root_actions`` if given.
+
+        The engine is restored to its position before this returns.
+        """
+        legal = engine.legal_actions() if root_actions is None else list(root_actions)
+        if not legal:
+            return None, -WIN
+        if self.reuse_tt:
+            self.tt.new_search()
+        else:
+            self.tt.clear(counters=False)
+        self._killers = [[None, None] for _ in range(self.max_depth + self.quiescence + 2)]
+        self._nodes = 0
+        self._start = time.perf_counter()
+        self._deadline = None if self.time_limit is None else self._start + self.time_limit
+        best, score, depth = legal[0], 0, 0
+        iterations: List[Tuple[int, Action, int]] = []
+        for d in range(1, self.max_depth + 1):
+            try:
+                move, value = self._root(engine, legal, d)
+            except _SearchAbort:
+                break
+            best, score, depth = move, value, d
+            iterations.append((d, move, value))
+            if abs(value) >= _MATE_BOUND or len(legal) == 1:
+                break
+        seconds = time.perf_counter() - self._start
+        self.stats = {
+            "depth": depth,
+            "nodes": self._nodes,
+            "seconds": seconds,
+            "nps": self._nodes / seconds if seconds > 0 else 0.0,
+            "score": score,
+            "iterations": iterations,
+            "tt": self.tt.stats(),
+        }
+        return best, score
+
+    # ---------- Search ----------
+    def _root(self, engine: Engine, legal: List[Action], depth: int) -> Tuple[Action, int]:
+        entry = self.tt.get(engine.hash)
+        moves = self._order(engine, legal, entry.move if entry is not None else None, 0)
+        alpha, beta = -WIN - 1, WIN + 1
+        best = moves[0]
+        for a in moves:
+            rec = engine.apply(a, events=False)
+            try:
+                value = -self._negamax(engine, depth - 1, -beta, -alpha, 1)
+            finally:
+                engine.undo(rec)
+            if value > alpha:
+                alpha, best = value, a
+        self.tt.put(engine.hash, depth, alpha, EXACT, best)
+        return best, alpha
+
+    def _tick(self) -> None:
+        self._nodes += 1
+        if self.node_limit is not None and self._nodes > self.node_limit:
+            raise _SearchAbort()
+        if self._deadline is not None and not self._nodes & 255 and time.perf_counter() > self._deadline:
+            raise _SearchAbort()
+
+    def _negamax(self, engine: Engine, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self._tick()
+        winner = engine.winner_if_any()
+        if winner is not None:
+            if winner == "draw":
+                return 0
+            return WIN - ply if winner == engine.state.to_move else -(WIN - ply)
+        if depth <= 0:
+            return self._quiesce(engine, alpha, beta, ply, self.quiescence)
+
+        key = engine.hash
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= depth:
+                value = _from_tt(entry.value, ply)
+                if entry.flag == EXACT:
+                    return value
+                if entry.flag == LOWER and value >= beta:
+                    return value
+                if entry.flag == UPPER and value <= alpha:
+                    return value
+
+        legal = engine.legal_actions()
+        if not legal:
+            # a side left without legal actions loses
+            return -(WIN - ply)
+        alpha0 = alpha
+        best_value, best = -WIN - 1, None
+        for a in self._order(engine, legal, tt_move, ply):
+            rec = engine.apply(a, events=False)
+            try:
+                value = -self._negamax(engine, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                engine.undo(rec)
+            if value > best_value:
+                best_value, best = value, a
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        if a[5] == 0:
+                            self._add_killer(ply, a)
+                        break
+        flag = UPPER if best_value <= alpha0 else LOWER if best_value >= beta else EXACT
+        self.tt.put(key, depth, _to_tt(best_value, ply), flag, best)
+        return best_value
+
+    def _quiesce(self, engine: Engine, alpha: int, beta: int, ply: int, depth: int) -> int:
+        """Stand-pat material, extended by material-winning captures while ``depth`` lasts."""
+        stand = self.evaluate(engine)
+        if depth <= 0 or stand >= beta:
+            return stand
+        alpha = max(alpha, stand)
+        gains = []
+        for a in engine.legal_actions():
+            if a[5]:
+                o = engine.predict_outcome(a)
+                gain = o.opp_loss - o.own_loss
+                if gain > 0:
+                    gains.append((-gain, a))
+        gains.sort()
+        mover = engine.state.to_move
+        for _, a in gains:
+            rec = engine.apply(a, events=False)
+            try:
+                self._tick()
+                winner = engine.winner_if_any()
+                if winner is not None:
+                    # as in _negamax, one ply down: a mutual trade can draw or lose the game
+                    if winner == "draw":
+                        value = 0
+                    else:
+                        value = WIN - ply - 1 if winner == mover else -(WIN - ply - 1)
+                else:
+                    value = -self._quiesce(engine, -beta, -alpha, ply + 1, depth - 1)
+            finally:
+                engine.undo(rec)
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+        return alpha
+
+    @staticmethod
+    def evaluate(engine: Engine) -> int:
+        """Material balance for the side to move."""
+        me = 0 if engine.state.to_move == "north" else 1
+        return engine.material_totals[me] - engine.material_totals[1 - me]
+
+    def _order(self, engine: Engine, legal: List[Action], tt_move: Optional[Action], ply: int) -> List[Action]:
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        keyed = []
+        for a in legal:
+            if a == tt_move:
+                key = -WIN
+            elif a[5]:  # melee, ranged or convert: most material won first
+                o = engine.predict_outcome(a)
+                gain = o.opp_loss - o.own_loss
+                key = -gain if gain >= 0 else 10_000 - gain
+            elif a == killers[0] or a == killers[1]:
+                key = 1
+            else:
+                key = 2
+            keyed.append((key, a))
+        keyed.sort(key=lambda x: x[0])
+        return [a for _, a in keyed]
+
+    def _add_killer(self, ply: int, action: Action) -> None:
+        if ply < len(self._killers):
+            slots = self._killers[ply]
+            if slots[0] != action:
+                slots[1] = slots[0]
+                slots[0] = action
+
+
+def _to_tt(value: int, ply: int) -> int:
+    # store win/loss scores relative to the node so they stay valid at other plies
+    if value >= _MATE_BOUND:
+        return value + ply
+    if value <= -_MATE_BOUND:
+        return value - ply
+    return value
+
+
+def _from_tt(value: int, ply: int) -> int:
+    if value >= _MATE_BOUND:
+        return value - ply
+    if value <= -_MATE_BOUND:
+        return value + ply
+    return value
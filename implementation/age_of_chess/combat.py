@@ -1,14 +1,19 @@
 from __future__ import annotations
-from typing import Tuple
-from .game_state import Unit
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import numpy as np
+from .game_state import PIECES, PIECE_ID
 
-def resolve_melee(att: Unit, def_top: Unit, def_bottom: Unit|None) -> Tuple[bool,bool,bool]:
+if TYPE_CHECKING:
+    from .rules_loader import Ruleset
+
+def resolve_melee(att: str, def_top: str, def_bottom: Optional[str]) -> Tuple[bool,bool,bool]:
     """
-    Return (attacker_alive, top_defender_alive, bottom_defender_alive).
-    Covers specific stacked defaults from RULES.md.
+    Return (attacker_alive, top_defender_alive, bottom_defender_alive) for piece codes.
+    Covers specific stacked defaults from RULES.md. The engine plays the ruleset's compiled
+    ``interactions`` (see ``compile_combat``); ``rulesets/default.yaml`` declares the same outcomes.
     """
-    A = att.code; D = def_top.code
-    B = def_bottom.code if def_bottom else None
+    A = att; D = def_top
+    B = def_bottom
 
     # Same-type (non-king): mutual destruction
     if A == D and A != "K":
@@ -53,3 +58,92 @@ def resolve_melee(att: Unit, def_top: Unit, def_bottom: Unit|None) -> Tuple[bool
 
     # Default neutral: attacker kills top only
     return (True, False, def_bottom is not None)
+
+
+class CombatTables:
+    """Combat outcomes compiled once per ruleset and indexed by packed piece id (0 = no unit).
+
+    ``melee[attacker][top][bottom]`` is the ``(attacker_alive, top_alive, bottom_alive)`` triple;
+    ``ranged[target]`` / ``power_shot[target]`` say whether a single or stacked archer shot kills
+    a target on top. ``melee_array`` / ``ranged_array`` / ``power_shot_array`` hold the same data
+    as NumPy arrays for vectorized callers.
+    """
+
+    def __init__(self, melee: List[List[List[Tuple[bool, bool, bool]]]], ranged: List[bool], power_shot: List[bool]):
+        self.melee = melee
+        self.ranged = ranged
+        self.power_shot = power_shot
+        self.melee_array = np.array(melee, dtype=bool)
+        self.ranged_array = np.array(ranged, dtype=bool)
+        self.power_shot_array = np.array(power_shot, dtype=bool)
+
+
+# Melee verbs of an ``interactions.vs`` entry, seen from the attacker:
+# (attacker_alive, top_alive, bottom_alive); a missing bottom stays absent.
+MELEE_VERBS: Dict[str, Tuple[bool, bool, bool]] = {
+    "win": (True, False, True),        # defender's top unit dies
+    "lose": (False, True, True),       # attacker dies
+    "mutual": (False, False, True),    # attacker and top unit die
+    "win_both": (True, False, False),  # top and bottom unit die
+}
+# Stack forms of an entry: ``{lone: verb, pair: verb, stack: verb}``; "pair" is a top unit stacked
+# on one of its own class, "stack" any other bottom. Omitted keys fall back to ``lone``.
+_STACK_KEYS = ("lone", "pair", "stack")
+
+
+def _verb(verb: Any, where: str) -> Tuple[bool, bool, bool]:
+    if verb not in MELEE_VERBS:
+        raise ValueError(f"{where}: unknown melee outcome {verb!r}; expected one of {sorted(MELEE_VERBS)}")
+    return MELEE_VERBS[verb]
+
+
+def _melee_table(rules: "Ruleset") -> List[List[List[Tuple[bool, bool, bool]]]]:
+    """Melee triples from the ``interactions.vs`` blocks; undeclared matchups are a "win"."""
+    n = len(PIECES) + 1
+    code_by_class = {spec.class_: code for code, spec in rules.game.pieces.items()}
+    melee = [[[(True, False, b != 0) for b in range(n)] for _ in range(n)] for _ in range(n)]
+    for att, spec in rules.game.pieces.items():
+        for cls, entry in (spec.interactions.get("vs") or {}).items():
+            where = f"pieces.{att}.interactions.vs.{cls}"
+            top = code_by_class.get(cls)
+            if top not in PIECE_ID or att not in PIECE_ID:
+                raise ValueError(f"{where}: no piece of class {cls!r}")
+            if not isinstance(entry, dict):
+                entry = {"lone": entry}
+            extra = set(entry) - set(_STACK_KEYS)
+            if "lone" not in entry or extra:
+                raise ValueError(f"{where}: expected a verb or a mapping with keys {_STACK_KEYS}")
+            outcome = {k: _verb(entry.get(k, entry["lone"]), f"{where}.{k}") for k in _STACK_KEYS}
+            a, t = PIECE_ID[att], PIECE_ID[top]
+            for b, bottom in enumerate(PIECES, start=1):
+                kind = "pair" if bottom == top else "stack"
+                melee[a][t][b] = outcome[kind]
+            att_alive, top_alive, _ = outcome["lone"]
+            melee[a][t][0] = (att_alive, top_alive, False)
+    return melee
+
+
+def _ability_kills(rules: "Ruleset", ability: str) -> List[bool]:
+    """Targets killed by ``ability`` (on any piece), mapped from piece classes to piece ids."""
+    code_by_class = {spec.class_: code for code, spec in rules.game.pieces.items()}
+    kills = [False] * (len(PIECES) + 1)
+    for spec in rules.game.pieces.values():
+        for ab in spec.abilities:
+            if ab.get("name") != ability:
+                continue
+            for cls in ab.get("kills", []):
+                code = code_by_class.get(cls)
+                if code in PIECE_ID:
+                    kills[PIECE_ID[code]] = True
+    return kills
+
+
+def compile_combat(rules: "Ruleset") -> CombatTables:
+    """Build the combat tables for ``rules``.
+
+    Melee comes from each piece's ``interactions.vs`` block, keyed by defender class, with a verb
+    from ``MELEE_VERBS`` or a ``{lone, pair, stack}`` mapping of verbs for stacked defenders, e.g.
+    ``pikeman: {lone: win, pair: mutual}``. Matchups left out are a "win". Ranged kills come from
+    the ``ranged`` / ``power_shot`` ability blocks.
+    """
+    return CombatTables(_melee_table(rules), _ability_kills(rules, "ranged"), _ability_kills(rules, "power_shot"))
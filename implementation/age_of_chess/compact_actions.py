@@ -0,0 +1,110 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import numpy as np
+
+from .movegen import MoveTables, tables_for
+from .rules_loader import Ruleset
+from .utils import ACTION_SPACE_SIZE, action_index
+
+# Action encodings an env can be built with
+ACTION_ENCODINGS = ("flat", "compact")
+
+
+class CompactActions:
+    """Compact action encoding: source square x slot x (action type, offset) pair.
+
+    Squares and offsets are taken from the mover's perspective, the same way observations are
+    rotated for south, so index ``k`` means the same move for either side. The (action type,
+    offset) pairs are exactly those the geometry tables can produce, which makes the space a few
+    thousand actions instead of ``ACTION_SPACE_SIZE``.
+
+    ``to_flat[side][k]`` is the flat index of compact action ``k`` (-1 if it leaves the board) and
+    ``from_flat[side][i]`` the compact index of flat action ``i`` (-1 if it has none).
+    """
+
+    def __init__(self, tables: MoveTables):
+        self.rows, self.cols = tables.rows, tables.cols
+        self.pairs: List[Tuple[int, int, int]] = self._pairs(tables)
+        self.size = self.rows * self.cols * 2 * len(self.pairs)
+        self.to_flat = np.full((2, self.size), -1, dtype=np.int64)
+        self.from_flat = np.full((2, ACTION_SPACE_SIZE), -1, dtype=np.int64)
+        for side in (0, 1):
+            for k in range(self.size):
+                psq, rest = divmod(k, 2 * len(self.pairs))
+                slot, j = divmod(rest, len(self.pairs))
+                atype, dr, dc = self.pairs[j]
+                fr, fc = self._orient(side, *divmod(psq, self.cols))
+                if side:
+                    dr, dc = -dr, -dc
+                tr, tc = fr + dr, fc + dc
+                if 0 <= tr < self.rows and 0 <= tc < self.cols:
+                    flat = action_index((fr, fc, slot, tr, tc, atype))
+                    self.to_flat[side, k] = flat
+                    self.from_flat[side, flat] = k
+        self.valid = self.to_flat >= 0
+        # invalid entries point at flat index 0 so gathers stay in bounds; ``valid`` masks them out
+        self._gather = np.where(self.valid, self.to_flat, 0)
+
+    def _orient(self, side: int, r: int, c: int) -> Tuple[int, int]:
+        return (self.rows - 1 - r, self.cols - 1 - c) if side else (r, c)
+
+    @staticmethod
+    def _pairs(tables: MoveTables) -> List[Tuple[int, int, int]]:
+        """(action type, d_row, d_col) pairs reachable in the north frame, from both sides' tables."""
+        pairs = set()
+        for side in (0, 1):
+            sign = -1 if side else 1
+            for sq, (r, c) in enumerate(tables.coords):
+                def add(atype: int, tr: int, tc: int) -> None:
+                    pairs.add((atype, sign * (tr - r), sign * (tc - c)))
+                for tr, tc, _ in tables.steps[side][sq]:
+                    add(0, tr, tc)
+                    add(1, tr, tc)
+                for tr, tc, _, melee in tables.cavalry[side][sq]:
+                    add(0, tr, tc)
+                    if melee:
+                        add(1, tr, tc)
+                for tr, tc, _, _ in tables.rays[side][sq]:
+                    add(2, tr, tc)
+                for tr, tc, _ in tables.adjacent[sq]:
+                    add(3, tr, tc)
+        return sorted(pairs)
+
+    def encode(self, flat, side: int):
+        """Compact index (or array of indices) of flat action(s) for ``side``; -1 where none exists."""
+        return self.from_flat[side][flat]
+
+    def decode(self, compact, side: int):
+        """Flat index (or array of indices) of compact action(s) for ``side``; -1 off the board."""
+        return self.to_flat[side][compact]
+
+    def mask(self, flat_mask: np.ndarray, side: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Compact ``int8`` mask from a flat mask of ``side``'s position."""
+        if out is None:
+            out = np.empty(self.size, dtype=np.int8)
+        np.take(flat_mask, self._gather[side], out=out)
+        out &= self.valid[side]
+        return out
+
+    def masks(self, flat_masks: np.ndarray, sides: np.ndarray) -> np.ndarray:
+        """Batched ``mask``: ``(n, ACTION_SPACE_SIZE)`` flat masks and ``(n,)`` sides to move."""
+        gather = self._gather[sides]
+        out = np.take_along_axis(flat_masks, gather, axis=1)
+        out &= self.valid[sides]
+        return out
+
+
+@lru_cache(maxsize=None)
+def _compact_for_tables(tables: MoveTables) -> CompactActions:
+    return CompactActions(tables)
+
+
+def compact_actions_for(rules: Ruleset) -> CompactActions:
+    return _compact_for_tables(tables_for(rules))
+
+
+def check_encoding(name: str) -> str:
+    if name not in ACTION_ENCODINGS:
+        raise ValueError(f"Unknown action encoding {name!r}; expected one of {ACTION_ENCODINGS}")
+    return name
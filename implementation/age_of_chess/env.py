@@ -1,104 +1,400 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, FrozenSet, NamedTuple, Union
 import numpy as np
-import copy
-from .rules_loader import load_ruleset, Ruleset
-from .game_state import GameState, standard_setup
+from .rules_loader import compiled_ruleset, Ruleset
+from .game_state import (
+    GameState, Board, standard_setup, code_of, side_of, PIECES, PIECE_ID, PIECE_MASK, SOUTH, EMPTY,
+)
 from .movegen import gen_single_moves, Action
-from .combat import resolve_melee
-from .utils import action_mask_from_legal
+from .utils import ACTION_SPACE_SIZE, encode_actions
+from .zobrist import zobrist_keys
 
 VAL = {"P":1,"N":3,"B":3,"R":5,"Q":4,"K":1000}
+# Piece value indexed by packed piece id (index 0 is the empty slot).
+PIECE_VAL = [0] + [VAL[code] for code in PIECES]
+
+_KING = PIECE_ID["K"]
+
+class UndoRecord:
+    """What ``Engine.apply`` changed: the action, the event dict, and the overwritten cells as a
+    flat ``[index, old_value, ...]`` list so ``Engine.undo`` can restore them in reverse."""
+    __slots__ = ("action", "event", "changes", "to_move", "move_count")
+
+    def __init__(self, action: Action, to_move: str, move_count: int):
+        self.action = action
+        self.event: Optional[Dict[str, Any]] = None
+        self.changes: List[int] = []
+        self.to_move = to_move
+        self.move_count = move_count
+
+class Outcome(NamedTuple):
+    """Predicted result of one action from the mover's point of view (material in VAL units)."""
+    own_loss: int
+    opp_loss: int
+    own_units_lost: int
+    own_king_lost: bool
+
+
+# Sort keys for the minimal_loss_rule.priority entries; lower is better.
+_MINIMAL_LOSS_KEYS = {
+    "king_safety": lambda o: o.own_king_lost,
+    "fewest_losses": lambda o: o.own_units_lost,
+    "highest_value": lambda o: o.own_loss,
+}
+
+
+class _LegalCache:
+    """Per-position legal actions plus the derived set, flat indices and mask, built on first use."""
+    __slots__ = ("key", "actions", "_set", "_indices", "_sorted", "mask")
+
+    def __init__(self, key: int, actions: List[Action]):
+        self.key = key
+        self.actions = actions
+        self._set: Optional[FrozenSet[Action]] = None
+        self._indices: Optional[np.ndarray] = None
+        self._sorted: Optional[np.ndarray] = None
+        self.mask: Optional[np.ndarray] = None
+
+    def action_set(self) -> FrozenSet[Action]:
+        if self._set is None:
+            self._set = frozenset(self.actions)
+        return self._set
+
+    def indices(self) -> np.ndarray:
+        if self._indices is None:
+            self._indices = encode_actions(self.actions)
+        return self._indices
+
+    def sorted_indices(self) -> np.ndarray:
+        if self._sorted is None:
+            self._sorted = np.unique(self.indices())
+            self._sorted.flags.writeable = False
+        return self._sorted
+
+class EngineSnapshot(NamedTuple):
+    """Position plus incremental tracker state, as taken by ``Engine.snapshot``."""
+    rows: int
+    cols: int
+    cells: bytes
+    to_move: str
+    move_count: int
+    hash: int
+    material_totals: Tuple[int, int]
+    piece_counts: Tuple[Tuple[int, ...], ...]
+    king_cells: Tuple[FrozenSet[int], FrozenSet[int]]
+    occ: np.ndarray  # (2, pieces, rows, cols) occupancy planes, north then south
+    legal: Optional[Tuple[Tuple[Action, ...], np.ndarray]]  # legal actions and their flat indices
+
+
+# Start-position snapshot per ruleset object: id(rules) -> (rules, snapshot).
+_START_SNAPSHOTS: Dict[int, Tuple[Ruleset, EngineSnapshot]] = {}
+
 
 class Engine:
-    def __init__(self, ruleset_path: str):
-        self.rules: Ruleset = load_ruleset(ruleset_path)
-        rows = self.rules.game.board["rows"]
-        cols = self.rules.game.board["cols"]
-        board = standard_setup(rows, cols)
-        self.state = GameState(board=board, to_move="north")
+    def __init__(self, ruleset_path: str, debug: bool = False):
+        compiled = compiled_ruleset(ruleset_path)
+        self.rules: Ruleset = compiled.rules
+        self.tables = compiled.tables
+        self.combat = self.rules.combat
+        # When set, every apply/undo cross-checks the incremental trackers against a full recount.
+        self.debug = debug
+        self._occ: Optional[np.ndarray] = None
+        # a new engine generates its own first legal actions; reset() reuses the snapshotted ones
+        self.restore(self._start_snapshot()._replace(legal=None))
+
+    def _buffers(self, rows: int, cols: int) -> None:
+        """Allocate the mask buffer and observation planes for a ``rows`` x ``cols`` board, or clear
+        the existing ones in place so views handed out by ``observe`` stay valid."""
+        if self._occ is not None and self._occ.shape[2:] == (rows, cols):
+            self._mask_buf[self._mask_set] = 0
+            self._mask_set = np.zeros(0, dtype=np.int64)
+            self._occ.fill(0)
+            return
+        # Preallocated mask; only the indices set for the previous position are cleared on reuse.
+        self._mask_buf = np.zeros(ACTION_SPACE_SIZE, dtype=np.int8)
+        self._mask_set = np.zeros(0, dtype=np.int64)
+        # Occupancy planes [side][piece][r][c] laid out as north, south, north again so both
+        # perspectives are views: north = blocks 0-1, south = blocks 1-2 rotated by 180 degrees.
+        self._occ = np.zeros((3, len(PIECES), rows, cols), dtype=np.int8)
+        self._views = {
+            "north": self._occ[0:2].reshape(2 * len(PIECES), rows, cols),
+            "south": self._occ[1:3, :, ::-1, ::-1].reshape(2 * len(PIECES), rows, cols),
+        }
+        for view in self._views.values():
+            view.flags.writeable = False
+
+    def set_state(self, state: GameState) -> None:
+        """Install ``state`` and rebuild the incremental trackers from it."""
+        self.state = state
+        self._zobrist = zobrist_keys(len(state.board.cells))
+        self._hash = self._zobrist.hash_cells(state.board.cells, state.to_move)
+        self._legal_cache: Optional[_LegalCache] = None
+        self._buffers(state.board.rows, state.board.cols)
+        # Running per-side totals indexed by side bit (0 north, 1 south).
+        self.material_totals = [0, 0]
+        self.piece_counts = [[0] * (len(PIECES) + 1) for _ in range(2)]
+        self.king_cells: List[set] = [set(), set()]
+        for i, v in enumerate(state.board.cells):
+            if v:
+                self._track(i, v, 1)
+        for r, c, _, u in state.board.units():
+            v = PIECE_ID[u.code] | (SOUTH if u.side == "south" else 0)
+            self._occ[v >> 3, (v & PIECE_MASK) - 1, r, c] = 1
+        self._occ[2] = self._occ[0]
+
+    def snapshot(self) -> "EngineSnapshot":
+        """Capture the position and its trackers (and legal actions, if already generated)."""
+        board = self.state.board
+        legal = self._legal_cache
+        if legal is not None and legal.key != self._hash:
+            legal = None
+        return EngineSnapshot(
+            board.rows, board.cols, bytes(board.cells), self.state.to_move, self.state.move_count,
+            self._hash, tuple(self.material_totals), tuple(map(tuple, self.piece_counts)),
+            tuple(map(frozenset, self.king_cells)), self._occ[:2].copy(),
+            None if legal is None else (tuple(legal.actions), legal.indices()),
+        )
+
+    def restore(self, snap: "EngineSnapshot") -> None:
+        """Install a position captured by ``snapshot``: array copies instead of a board rescan."""
+        self.state = GameState(Board(snap.rows, snap.cols, snap.cells), snap.to_move, move_count=snap.move_count)
+        self._zobrist = zobrist_keys(len(snap.cells))
+        self._hash = snap.hash
+        self._legal_cache = None
+        if snap.legal is not None:
+            self._legal_cache = _LegalCache(snap.hash, list(snap.legal[0]))
+            self._legal_cache._indices = snap.legal[1]
+        self._buffers(snap.rows, snap.cols)
+        self.material_totals = list(snap.material_totals)
+        self.piece_counts = [list(c) for c in snap.piece_counts]
+        self.king_cells = [set(k) for k in snap.king_cells]
+        self._occ[:2] = snap.occ
+        self._occ[2] = snap.occ[0]
+
+    def reset(self, start: Union[None, GameState, "EngineSnapshot"] = None) -> None:
+        """Go back to the ruleset's start position, or to ``start``.
+
+        The start position is snapshotted once per ruleset (legal actions included), so a plain
+        reset is a few buffer copies. Pass ``snapshot()`` results for cheap custom starts; a
+        ``GameState`` is copied and rescanned like ``set_state``.
+        """
+        if start is None:
+            start = self._start_snapshot()
+        if isinstance(start, EngineSnapshot):
+            self.restore(start)
+        else:
+            self.set_state(start.copy())
+
+    def _start_snapshot(self) -> "EngineSnapshot":
+        entry = _START_SNAPSHOTS.get(id(self.rules))
+        if entry is None or entry[0] is not self.rules:
+            board = self.rules.game.board
+            self.set_state(GameState(board=standard_setup(board["rows"], board["cols"]), to_move="north"))
+            self._legal()
+            entry = _START_SNAPSHOTS[id(self.rules)] = (self.rules, self.snapshot())
+        return entry[1]
+
+    @property
+    def hash(self) -> int:
+        """64-bit Zobrist hash of the board and side to move, maintained incrementally."""
+        return self._hash
 
     # ---------- Helpers ----------
     def _material(self) -> Dict[str,int]:
-        tot = {"north":0,"south":0}
-        for r in range(self.state.board.rows):
-            for c in range(self.state.board.cols):
-                sq = self.state.board.grid[r][c]
-                for u in [sq.top, sq.bottom]:
-                    if u:
-                        tot[u.side] += VAL.get(u.code,0)
-        return tot
-
-    def _apply_on_copy(self, a: Action) -> "Engine":
-        e2 = copy.deepcopy(self)
-        e2.apply(a)
-        return e2
+        return {"north": self.material_totals[0], "south": self.material_totals[1]}
+
+    def _track(self, i: int, v: int, sign: int) -> None:
+        s = v >> 3
+        p = v & PIECE_MASK
+        self.material_totals[s] += sign * PIECE_VAL[p]
+        self.piece_counts[s][p] += sign
+        if p == _KING:
+            if sign > 0:
+                self.king_cells[s].add(i)
+            else:
+                self.king_cells[s].discard(i)
+
+    def _write(self, i: int, v: int) -> None:
+        """Set packed cell ``i`` to ``v``, keeping material, piece counts, kings and hash in sync."""
+        cells = self.state.board.cells
+        old = cells[i]
+        keys = self._zobrist.cells[i]
+        self._hash ^= keys[old] ^ keys[v]
+        r, c = self.tables.coords[i >> 1]
+        occ = self._occ
+        if old:
+            self._track(i, old, -1)
+            # the other slot may hold an identical unit that keeps the plane set
+            if cells[i ^ 1] != old:
+                s, p = old >> 3, (old & PIECE_MASK) - 1
+                occ[s, p, r, c] = 0
+                if not s:
+                    occ[2, p, r, c] = 0
+        if v:
+            self._track(i, v, 1)
+            s, p = v >> 3, (v & PIECE_MASK) - 1
+            occ[s, p, r, c] = 1
+            if not s:
+                occ[2, p, r, c] = 1
+        cells[i] = v
+
+    def _put(self, rec: "UndoRecord", i: int, v: int) -> None:
+        """Write packed cell ``i`` and log its previous value for ``undo``."""
+        rec.changes.append(i)
+        rec.changes.append(self.state.board.cells[i])
+        self._write(i, v)
+
+    def check_tracking(self) -> None:
+        """Recount the board and raise if the incremental trackers disagree with it."""
+        material = [0, 0]
+        counts = [[0] * (len(PIECES) + 1) for _ in range(2)]
+        kings: List[set] = [set(), set()]
+        for i, v in enumerate(self.state.board.cells):
+            if v:
+                material[v >> 3] += PIECE_VAL[v & PIECE_MASK]
+                counts[v >> 3][v & PIECE_MASK] += 1
+                if v & PIECE_MASK == _KING:
+                    kings[v >> 3].add(i)
+        if material != self.material_totals or counts != self.piece_counts or kings != self.king_cells:
+            raise RuntimeError("Incremental material/king tracking out of sync with the board")
+        if self._hash != self._zobrist.hash_cells(self.state.board.cells, self.state.to_move):
+            raise RuntimeError("Incremental Zobrist hash out of sync with the board")
+        occ = np.zeros_like(self._occ[:2])
+        for r, c, _, u in self.state.board.units():
+            occ[1 if u.side == "south" else 0, PIECE_ID[u.code] - 1, r, c] = 1
+        if not (np.array_equal(occ, self._occ[:2]) and np.array_equal(self._occ[0], self._occ[2])):
+            raise RuntimeError("Incremental observation planes out of sync with the board")
+
+    def king_locations(self, side: str) -> List[Tuple[int, int]]:
+        cols = self.state.board.cols
+        return sorted(divmod(i // 2, cols) for i in self.king_cells[0 if side == "north" else 1])
 
     # ---------- Rules ----------
     def legal_actions_unfiltered(self) -> List[Action]:
-        return gen_single_moves(self.state, self.rules)
+        return gen_single_moves(self.state, self.rules, self.tables)
+
+    def _legal(self) -> "_LegalCache":
+        """Legal actions of the current position, memoized by position hash."""
+        cache = self._legal_cache
+        if cache is None or cache.key != self._hash:
+            cache = self._legal_cache = _LegalCache(self._hash, self._legal_actions())
+        return cache
 
     def legal_actions(self) -> List[Action]:
+        return list(self._legal().actions)
+
+    def legal_set(self) -> FrozenSet[Action]:
+        return self._legal().action_set()
+
+    def legal_action_indices(self) -> np.ndarray:
+        """Flat indices of ``legal_actions()``, in the same order (cached per position)."""
+        return self._legal().indices()
+
+    def legal_indices(self) -> np.ndarray:
+        """Sorted, duplicate-free flat indices of the legal actions (read-only, cached per position)."""
+        return self._legal().sorted_indices()
+
+    def is_legal(self, action: Action) -> bool:
+        return action in self._legal().action_set()
+
+    def _legal_actions(self) -> List[Action]:
         acts = self.legal_actions_unfiltered()
         if not acts:
             return acts
         # Minimal-loss enforcement if enabled
-        ml = self.rules.game.turn.get("minimal_loss_rule", {}).get("enabled", False)
-        if not ml:
+        ml = self.rules.game.turn.get("minimal_loss_rule", {})
+        if not ml.get("enabled", False):
             return acts
-        before = self._material()
-        side_now = self.state.to_move
-        scored = []
-        for a in acts:
-            try:
-                e2 = self._apply_on_copy(a)
-                after = e2._material()
-                own_loss = before[side_now] - after[side_now]
-                opp_loss = before["south" if side_now=="north" else "north"] - after["south" if side_now=="north" else "north"]
-                scored.append((own_loss, -opp_loss, a))
-            except Exception:
-                continue
-        if not scored:
+        outcomes = [self.predict_outcome(a) for a in acts]
+        # The rule only applies when every legal move loses material this turn.
+        if min(o.own_loss for o in outcomes) <= 0:
             return acts
-        min_own_loss = min(s[0] for s in scored)
-        if min_own_loss <= 0:
-            return [s[2] for s in scored]
-        best = [s for s in scored if s[0] == min_own_loss]
-        best.sort()
-        return [s[2] for s in best]
+        keep = list(range(len(acts)))
+        for criterion in ml.get("priority", ["fewest_losses", "highest_value"]):
+            key = _MINIMAL_LOSS_KEYS.get(criterion)
+            if key is None:  # "free_choice" and unknown entries leave the tie as is
+                continue
+            best = min(key(outcomes[i]) for i in keep)
+            keep = [i for i in keep if key(outcomes[i]) == best]
+        keep.sort(key=lambda i: (outcomes[i].own_loss, -outcomes[i].opp_loss, acts[i]))
+        return [acts[i] for i in keep]
+
+    def predict_outcome(self, action: Action) -> Outcome:
+        """Material consequences of ``action`` for the side to move, computed without applying it.
+
+        Mirrors ``apply``: melee through the compiled combat table, ranged shots kill the target's top unit,
+        conversion moves the target's value from the opponent to the mover.
+        """
+        fr, fc, slot, tr, tc, atype = action
+        board = self.state.board
+        cells = board.cells
+        si = board.index(fr, fc)
+        di = board.index(tr, tc)
+        u = cells[si + slot]
+        top, bottom = cells[di], cells[di + 1]
+        me = u >> 3
+        lost = [0, 0]
+        units = [0, 0]
+        king_lost = False
 
-    def action_mask(self) -> List[int]:
-        return action_mask_from_legal(self.legal_actions())
+        def kill(v: int) -> None:
+            nonlocal king_lost
+            lost[v >> 3] += PIECE_VAL[v & PIECE_MASK]
+            units[v >> 3] += 1
+            if v & PIECE_MASK == _KING and v >> 3 == me:
+                king_lost = True
+
+        if atype == 1:
+            att_alive, top_alive, bottom_alive = self.combat.melee[u & PIECE_MASK][top & PIECE_MASK][bottom & PIECE_MASK]
+            if not top_alive:
+                kill(top)
+            if bottom and not bottom_alive:
+                kill(bottom)
+            # a surviving attacker needs a free slot on the target square
+            if not att_alive or (top_alive and bottom and bottom_alive):
+                kill(u)
+        elif atype == 2:
+            kill(top)
+        elif atype == 3:
+            value = PIECE_VAL[top & PIECE_MASK]
+            lost[top >> 3] += value
+            lost[me] -= value
+        return Outcome(lost[me], lost[1 - me], units[me], king_lost)
+
+    def action_mask(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Flat ``int8`` action mask of the current position.
+
+        Without ``out`` this returns the engine's own buffer, which is rewritten in place when the
+        position changes; copy it (or pass ``out``) to keep a mask across moves.
+        """
+        cache = self._legal()
+        if out is not None:
+            out.fill(0)
+            out[cache.indices()] = 1
+            return out
+        if cache.mask is None:
+            buf = self._mask_buf
+            buf[self._mask_set] = 0
+            self._mask_set = cache.indices()
+            buf[self._mask_set] = 1
+            cache.mask = buf
+        return cache.mask
 
     def kings_present(self) -> dict:
-        seen = {"north": False, "south": False}
-        for r in range(self.state.board.rows):
-            for c in range(self.state.board.cols):
-                sq = self.state.board.grid[r][c]
-                for u in [sq.top, sq.bottom]:
-                    if u and u.code == "K":
-                        seen[u.side] = True
-        return seen
-
-    def observe(self, agent: str) -> np.ndarray:
-        """Return a channel-first binary tensor encoding board occupancy from the agent's perspective."""
-        rows = self.state.board.rows
-        cols = self.state.board.cols
-        obs = np.zeros((12, rows, cols), dtype=np.int8)
-        own = agent
-        opp = "south" if agent == "north" else "north"
-        code_to_idx = {"P": 0, "N": 1, "B": 2, "R": 3, "Q": 4, "K": 5}
-
-        for r in range(rows):
-            for c in range(cols):
-                sq = self.state.board.grid[r][c]
-                for unit in filter(None, (sq.top, sq.bottom)):
-                    channel_offset = 0 if unit.side == own else 6
-                    idx = channel_offset + code_to_idx.get(unit.code, 0)
-                    rr, cc = (rows - 1 - r, cols - 1 - c) if agent == "south" else (r, c)
-                    obs[idx, rr, cc] = 1
-
-        return obs
+        counts = self.piece_counts
+        return {"north": counts[0][_KING] > 0, "south": counts[1][_KING] > 0}
+
+    def observe(self, agent: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return a channel-first binary tensor encoding board occupancy from the agent's perspective.
+
+        The tensor is kept up to date by apply/undo. Without ``out`` the result is a read-only view
+        that follows the live position; pass ``out`` (shape ``(12, rows, cols)``) to get a copy.
+        """
+        view = self._views[agent]
+        if out is None:
+            return view
+        np.copyto(out, view)
+        return out
 
     def winner_if_any(self) -> Optional[str]:
         seen = self.kings_present()
@@ -110,84 +406,119 @@ class Engine:
             return "draw"
         return None
 
-    def apply(self, action: Action) -> Dict[str, Any]:
-        """Apply action and return event info for reward shaping/logging."""
+    def apply(self, action: Action, events: bool = True) -> UndoRecord:
+        """Apply action and return an undo record; ``record.event`` holds event info for reward
+        shaping/logging (``None`` when ``events`` is False, e.g. during lookahead)."""
+        rec = UndoRecord(action, self.state.to_move, self.state.move_count)
+        try:
+            rec.event = self._apply(rec, action, events)
+        except Exception:
+            self.undo(rec)
+            raise
+        # swap side
+        self.state.to_move = "south" if self.state.to_move == "north" else "north"
+        self.state.move_count += 1
+        self._hash ^= self._zobrist.south_to_move
+        if self.debug:
+            self.check_tracking()
+        return rec
+
+    def undo(self, rec: UndoRecord) -> None:
+        """Revert the move recorded in ``rec``; records must be undone in reverse order of apply."""
+        write = self._write
+        changes = rec.changes
+        for k in range(len(changes) - 2, -1, -2):
+            write(changes[k], changes[k + 1])
+        if self.state.to_move != rec.to_move:
+            self._hash ^= self._zobrist.south_to_move
+        self.state.to_move = rec.to_move
+        self.state.move_count = rec.move_count
+        if self.debug:
+            self.check_tracking()
+
+    def _apply(self, rec: UndoRecord, action: Action, events: bool) -> Optional[Dict[str, Any]]:
         fr, fc, slot, tr, tc, atype = action
-        src = self.state.board.grid[fr][fc]
-        u = src.top if slot == 0 else src.bottom
-        if u is None or u.side != self.state.to_move:
+        board = self.state.board
+        cells = board.cells
+        put = self._put
+        si = board.index(fr, fc)
+        di = board.index(tr, tc)
+        u = cells[si + slot]
+        if not u or side_of(u) != self.state.to_move:
             raise ValueError("Illegal source unit")
-        moved_code = u.code
-        moved_side = u.side
+        moved_code = code_of(u)
         # detect power-shot eligibility before removal
-        is_power_archer = False
-        if moved_code == "B":
-            if slot == 0 and src.bottom is not None and src.bottom.code == "B":
-                is_power_archer = True
-            if slot == 1 and src.top is not None and src.top.code == "B":
-                is_power_archer = True
+        is_power_archer = moved_code == "B" and (cells[si + 1 - slot] & PIECE_MASK) == PIECE_ID["B"]
 
-        # remove from source
-        moved = src.remove_unit("top" if slot == 0 else "bottom")
-        dst = self.state.board.grid[tr][tc]
+        # remove from source; the bottom unit moves up when the top one leaves
+        moved = u
+        if slot == 0:
+            put(rec, si, cells[si + 1])
+        if cells[si + 1]:
+            put(rec, si + 1, EMPTY)
+        own = moved & SOUTH
+        top, bottom = cells[di], cells[di + 1]
 
-        event: Dict[str, Any] = {"atype": atype, "actor": moved_code, "from": (fr,fc), "to": (tr,tc), "slot": slot}
+        event: Optional[Dict[str, Any]] = None
+        if events:
+            event = {"atype": atype, "actor": moved_code, "from": (fr,fc), "to": (tr,tc), "slot": slot}
 
         if atype == 0:  # move/stack
-            if dst.top and dst.top.side == moved.side and dst.bottom is None:
-                dst.bottom = moved
+            if top and (top & SOUTH) == own and not bottom:
+                put(rec, di + 1, moved)
             else:
-                if dst.top is None:
-                    dst.top = moved
+                if not top:
+                    put(rec, di, moved)
                 else:
                     raise ValueError("Illegal move stacking")
 
         elif atype == 1:  # melee
-            if dst.top is None or dst.top.side == moved.side:
+            if not top or (top & SOUTH) == own:
                 raise ValueError("Illegal capture")
-            def_top_code = dst.top.code
-            def_bottom_code = dst.bottom.code if dst.bottom else None
-            att_alive, top_alive, bottom_alive = resolve_melee(moved, dst.top, dst.bottom)
-            dst_top, dst_bottom = dst.top, dst.bottom
-            dst.top = dst_top if top_alive else None
-            dst.bottom = dst_bottom if bottom_alive else None
-            event["capture"] = {"def_top": def_top_code, "def_bottom": def_bottom_code, "att_alive": att_alive, "top_alive": top_alive, "bottom_alive": bottom_alive}
+            def_top_code = code_of(top)
+            def_bottom_code = code_of(bottom) if bottom else None
+            att_alive, top_alive, bottom_alive = self.combat.melee[moved & PIECE_MASK][top & PIECE_MASK][bottom & PIECE_MASK]
+            if not top_alive:
+                put(rec, di, EMPTY)
+            if bottom and not bottom_alive:
+                put(rec, di + 1, EMPTY)
+            if event is not None:
+                event["capture"] = {"def_top": def_top_code, "def_bottom": def_bottom_code, "att_alive": att_alive, "top_alive": top_alive, "bottom_alive": bottom_alive}
             if att_alive:
-                if dst.top is None:
-                    dst.top = moved
-                elif dst.bottom is None:
-                    dst.bottom = moved
+                if not cells[di]:
+                    put(rec, di, moved)
+                elif not cells[di + 1]:
+                    put(rec, di + 1, moved)
 
         elif atype == 2:  # ranged
-            if dst.top is None or dst.top.side == moved.side:
+            if not top or (top & SOUTH) == own:
                 raise ValueError("Illegal ranged")
-            killed_code = dst.top.code
-            dst.top = None
-            if dst.bottom is not None:
-                dst.top, dst.bottom = dst.bottom, None
+            killed_code = code_of(top)
+            put(rec, di, bottom)
+            if bottom:
+                put(rec, di + 1, EMPTY)
             # put archer back
-            if src.top is None:
-                src.top = moved
-            elif src.bottom is None:
-                src.bottom = moved
+            if not cells[si]:
+                put(rec, si, moved)
+            elif not cells[si + 1]:
+                put(rec, si + 1, moved)
             else:
                 raise RuntimeError("Source overfull after ranged")
-            event["ranged"] = {"killed": killed_code, "power_shot": bool(is_power_archer and killed_code in ("N","R"))}
+            if event is not None:
+                event["ranged"] = {"killed": killed_code, "power_shot": bool(is_power_archer and self.combat.power_shot[top & PIECE_MASK])}
 
         elif atype == 3:  # convert
-            if dst.top is None or dst.bottom is not None or dst.top.side == moved.side:
+            if not top or bottom or (top & SOUTH) == own:
                 raise ValueError("Illegal convert target")
-            converted_code = dst.top.code
-            dst.top.side = moved.side
-            if src.top is None:
-                src.top = moved
-            elif src.bottom is None:
-                src.bottom = moved
-            event["convert"] = {"converted": converted_code}
+            converted_code = code_of(top)
+            put(rec, di, top ^ SOUTH)
+            if not cells[si]:
+                put(rec, si, moved)
+            elif not cells[si + 1]:
+                put(rec, si + 1, moved)
+            if event is not None:
+                event["convert"] = {"converted": converted_code}
         else:
             raise ValueError("Unknown action type")
 
-        # swap side
-        self.state.to_move = "south" if self.state.to_move == "north" else "north"
-        self.state.move_count += 1
         return event
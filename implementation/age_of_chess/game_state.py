@@ -1,55 +1,146 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import Optional, List
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+import struct
+import numpy as np
+
+# Packed cell encoding: one byte per (square, slot).
+#   0            -> empty
+#   1..6         -> north P, N, B, R, Q, K
+#   9..14        -> south P, N, B, R, Q, K  (piece id | SOUTH)
+PIECES: Tuple[str, ...] = ("P", "N", "B", "R", "Q", "K")
+PIECE_ID = {code: i + 1 for i, code in enumerate(PIECES)}
+SIDES: Tuple[str, str] = ("north", "south")
+EMPTY = 0
+SOUTH = 8
+PIECE_MASK = 7
+
+
+def pack(code: str, side: str) -> int:
+    return PIECE_ID[code] | (SOUTH if side == "south" else 0)
+
+
+def piece_of(v: int) -> int:
+    return v & PIECE_MASK
+
+
+def code_of(v: int) -> str:
+    return PIECES[(v & PIECE_MASK) - 1]
+
+
+def side_of(v: int) -> str:
+    return "south" if v & SOUTH else "north"
+
+
+def side_bit(side: str) -> int:
+    return SOUTH if side == "south" else 0
+
 
 @dataclass
 class Unit:
     code: str      # 'P','N','B','R','Q','K'
     side: str      # 'north' or 'south'
 
+
 @dataclass
 class Square:
+    """Read-only snapshot of one board square, as returned by ``Board.square``."""
     top: Optional[Unit] = None
     bottom: Optional[Unit] = None
 
     def is_empty(self) -> bool:
         return self.top is None and self.bottom is None
 
-    def add_unit(self, u: Unit) -> None:
-        if self.top is None:
-            self.top = u
-        elif self.bottom is None:
-            self.bottom = u
+
+def _unit(v: int) -> Optional[Unit]:
+    return Unit(code_of(v), side_of(v)) if v else None
+
+
+class Board:
+    """Array-backed board.
+
+    ``cells`` is a flat ``bytearray`` of ``rows * cols * 2`` packed units; the top slot of
+    square ``(r, c)`` lives at ``2 * (r * cols + c)`` and the bottom slot right after it.
+    Plain byte indexing keeps the Python hot loops allocation-free, ``planes()`` exposes the
+    same memory as an ``int8`` NumPy view, and copying or serialising a board is one memcpy.
+    """
+    __slots__ = ("rows", "cols", "cells")
+
+    def __init__(self, rows: int, cols: int, cells: Optional[bytes] = None):
+        self.rows = rows
+        self.cols = cols
+        if cells is None:
+            self.cells = bytearray(rows * cols * 2)
         else:
-            raise ValueError("Square already has two units")
+            if len(cells) != rows * cols * 2:
+                raise ValueError("Cell buffer does not match board size")
+            self.cells = bytearray(cells)
 
-    def remove_unit(self, which: str = "top") -> Unit:
-        if which == "top":
-            if self.top is None: raise ValueError("No top unit")
-            u = self.top
-            self.top = None
-            if self.bottom is not None:
-                self.top, self.bottom = self.bottom, None
-            return u
+    def index(self, r: int, c: int, slot: int = 0) -> int:
+        return 2 * (r * self.cols + c) + slot
+
+    def get(self, r: int, c: int, slot: int = 0) -> int:
+        return self.cells[2 * (r * self.cols + c) + slot]
+
+    def unit(self, r: int, c: int, slot: int = 0) -> Optional[Unit]:
+        return _unit(self.get(r, c, slot))
+
+    def square(self, r: int, c: int) -> Square:
+        i = 2 * (r * self.cols + c)
+        return Square(_unit(self.cells[i]), _unit(self.cells[i + 1]))
+
+    def units(self) -> Iterator[Tuple[int, int, int, Unit]]:
+        """Yield ``(row, col, slot, unit)`` for every occupied slot."""
+        for i, v in enumerate(self.cells):
+            if v:
+                sq, slot = divmod(i, 2)
+                r, c = divmod(sq, self.cols)
+                yield r, c, slot, Unit(code_of(v), side_of(v))
+
+    def is_empty(self, r: int, c: int) -> bool:
+        i = 2 * (r * self.cols + c)
+        return not self.cells[i] and not self.cells[i + 1]
+
+    def add_unit(self, r: int, c: int, code: str, side: str) -> None:
+        i = 2 * (r * self.cols + c)
+        if not self.cells[i]:
+            self.cells[i] = pack(code, side)
+        elif not self.cells[i + 1]:
+            self.cells[i + 1] = pack(code, side)
         else:
-            if self.bottom is None: raise ValueError("No bottom unit")
-            u = self.bottom
-            self.bottom = None
-            return u
+            raise ValueError("Square already has two units")
 
-@dataclass
-class Board:
-    rows: int
-    cols: int
-    grid: List[List[Square]] = field(default_factory=list)
+    def remove_unit(self, r: int, c: int, slot: int = 0) -> int:
+        """Remove and return the packed unit in ``slot``; the bottom unit moves up if the top leaves."""
+        i = 2 * (r * self.cols + c)
+        v = self.cells[i + slot]
+        if not v:
+            raise ValueError("No top unit" if slot == 0 else "No bottom unit")
+        if slot == 0:
+            self.cells[i] = self.cells[i + 1]
+            self.cells[i + 1] = EMPTY
+        else:
+            self.cells[i + 1] = EMPTY
+        return v
 
-    def __post_init__(self):
-        if not self.grid:
-            self.grid = [[Square() for _ in range(self.cols)] for _ in range(self.rows)]
+    def planes(self) -> np.ndarray:
+        """Zero-copy ``int8`` view of the cells with shape ``(rows, cols, 2)``."""
+        return np.frombuffer(self.cells, dtype=np.int8).reshape(self.rows, self.cols, 2)
 
     def copy(self) -> "Board":
-        import copy
-        return copy.deepcopy(self)
+        return Board(self.rows, self.cols, self.cells)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.rows == other.rows and self.cols == other.cols and self.cells == other.cells
+
+    def __repr__(self) -> str:
+        return f"Board(rows={self.rows}, cols={self.cols})"
+
+
+_HEADER = struct.Struct("<BBBI")  # rows, cols, side to move, move_count
+
 
 @dataclass
 class GameState:
@@ -59,6 +150,21 @@ class GameState:
     winner: Optional[str] = None
     move_count: int = 0
 
+    def copy(self) -> "GameState":
+        return GameState(self.board.copy(), self.to_move, self.terminated, self.winner, self.move_count)
+
+    def to_bytes(self) -> bytes:
+        """Compact serialisation (header + packed cells) for hashing or sending to other processes."""
+        b = self.board
+        return _HEADER.pack(b.rows, b.cols, SIDES.index(self.to_move), self.move_count) + bytes(b.cells)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameState":
+        rows, cols, side, move_count = _HEADER.unpack_from(data)
+        board = Board(rows, cols, data[_HEADER.size:])
+        return cls(board=board, to_move=SIDES[side], move_count=move_count)
+
+
 def standard_setup(rows: int, cols: int) -> Board:
     b = Board(rows, cols)
     # North (bottom) moves up; South (top) moves down.
@@ -69,13 +175,13 @@ def standard_setup(rows: int, cols: int) -> Board:
 
     order = ["R","N","B","Q","K","B","N","R"]
     for c, code in enumerate(order):
-        b.grid[north_back][c].add_unit(Unit(code, "north"))
+        b.add_unit(north_back, c, code, "north")
     for c in range(cols):
-        b.grid[north_pawn][c].add_unit(Unit("P", "north"))
+        b.add_unit(north_pawn, c, "P", "north")
 
     for c, code in enumerate(order):
-        b.grid[south_back][c].add_unit(Unit(code, "south"))
+        b.add_unit(south_back, c, code, "south")
     for c in range(cols):
-        b.grid[south_pawn][c].add_unit(Unit("P", "south"))
+        b.add_unit(south_pawn, c, "P", "south")
 
     return b
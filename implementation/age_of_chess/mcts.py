@@ -0,0 +1,265 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import inspect
+import math
+import time
+import numpy as np
+
+from .env import Engine, VAL
+from .game_state import PIECES
+from .movegen import Action
+from .utils import ACTION_SPACE_SIZE, index_action
+
+# Observation channel values (own pieces first, as in Engine.observe); kings are left out.
+_CHANNEL_VAL = np.array([VAL[c] if c != "K" else 0 for c in PIECES], dtype=np.float64)
+
+
+class MaterialEvaluator:
+    """Network-free evaluator: uniform priors and a squashed material balance read off the
+    observation planes. A baseline for ``MCTSAgent`` and a stand-in when no checkpoint is at hand."""
+
+    def __init__(self, scale: float = 10.0):
+        self.scale = scale
+
+    def evaluate(self, obs: np.ndarray, legal: Sequence[np.ndarray], sides: np.ndarray
+                 ) -> Tuple[List[np.ndarray], np.ndarray]:
+        counts = obs.sum(axis=(2, 3), dtype=np.int64)
+        n = len(PIECES)
+        balance = counts[:, :n] @ _CHANNEL_VAL - counts[:, n:] @ _CHANNEL_VAL
+        priors = [np.full(len(idx), 1.0 / len(idx)) for idx in legal]
+        return priors, np.tanh(balance / self.scale)
+
+
+class SB3Evaluator:
+    """Priors and values from a stable-baselines3 actor-critic (MaskablePPO, PPO, A2C).
+
+    One call evaluates a whole batch of leaves with a single forward pass. Models trained with
+    ``action_encoding="compact"`` are detected from their action space. Values are clipped to
+    [-1, 1]; the self-play envs reward the side to move, so no sign change is needed.
+    """
+
+    def __init__(self, model, rules=None):
+        self.model = model
+        self.policy = model.policy
+        n = model.action_space.n
+        self._compact = None
+        if n != ACTION_SPACE_SIZE:
+            from .compact_actions import compact_actions_for
+            if rules is None:
+                raise ValueError("A compact-encoding model needs the ruleset to map its actions")
+            self._compact = compact_actions_for(rules)
+            if self._compact.size != n:
+                raise ValueError(f"Model action space ({n}) matches neither action encoding")
+        self._n = n
+        # sb3-contrib maskable policies take the masks in get_distribution
+        self.is_maskable = "action_masks" in inspect.signature(self.policy.get_distribution).parameters
+
+    def evaluate(self, obs: np.ndarray, legal: Sequence[np.ndarray], sides: np.ndarray
+                 ) -> Tuple[List[np.ndarray], np.ndarray]:
+        import torch as th
+
+        if self._compact is not None:
+            legal = [self._compact.encode(idx, int(s)) for idx, s in zip(legal, sides)]
+        masks = np.zeros((len(obs), self._n), dtype=bool)
+        for i, idx in enumerate(legal):
+            masks[i, idx] = True
+        obs_t, _ = self.policy.obs_to_tensor(obs)
+        with th.no_grad():
+            if self.is_maskable:
+                dist = self.policy.get_distribution(obs_t, action_masks=masks)
+            else:
+                dist = self.policy.get_distribution(obs_t)
+            probs = dist.distribution.probs.cpu().numpy()
+            values = self.policy.predict_values(obs_t).cpu().numpy().reshape(-1)
+        priors = []
+        for i, idx in enumerate(legal):
+            p = probs[i, idx].astype(np.float64)
+            total = p.sum()
+            priors.append(p / total if total > 0 else np.full(len(idx), 1.0 / len(idx)))
+        return priors, np.clip(values, -1.0, 1.0)
+
+
+class _Node:
+    """Search node; edge statistics are arrays over the node's legal actions, seen from the side
+    to move here."""
+    __slots__ = ("actions", "priors", "n", "w", "children", "visits", "terminal", "pending")
+
+    def __init__(self):
+        self.actions: Optional[List[Action]] = None
+        self.priors: Optional[np.ndarray] = None
+        self.n: Optional[np.ndarray] = None
+        self.w: Optional[np.ndarray] = None
+        self.children: Optional[List[Optional[_Node]]] = None
+        self.visits = 0.0
+        self.terminal: Optional[float] = None  # value for the side to move once known to be final
+        self.pending = False  # queued for evaluation in the current batch
+
+    def expand(self, actions: List[Action], priors: np.ndarray) -> None:
+        self.actions = actions
+        self.priors = priors
+        self.n = np.zeros(len(actions))
+        self.w = np.zeros(len(actions))
+        self.children = [None] * len(actions)
+
+
+class MCTSAgent:
+    """PUCT Monte Carlo tree search over ``Engine.apply``/``undo``.
+
+    Leaves are collected into batches of up to ``batch_size`` and sent to ``evaluator`` together;
+    virtual loss on the paths in flight spreads one batch over different leaves. A search runs
+    ``simulations`` simulations, or as many as fit in ``time_limit`` seconds when that is set,
+    and plays the most visited root action. ``stats`` describes the last search: simulations per
+    second, evaluator calls and the batch sizes they got.
+    """
+
+    def __init__(self, evaluator=None, simulations: int = 200, batch_size: int = 16, c_puct: float = 1.5,
+                 virtual_loss: float = 1.0, time_limit: Optional[float] = None, root_noise: float = 0.0,
+                 dirichlet_alpha: float = 0.3, seed: Optional[int] = None):
+        if simulations < 1 or batch_size < 1:
+            raise ValueError("simulations and batch_size must be positive")
+        self.evaluator = evaluator if evaluator is not None else MaterialEvaluator()
+        self.simulations = simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.time_limit = time_limit
+        # fraction of Dirichlet noise mixed into the root priors (0 keeps the search deterministic)
+        self.root_noise = root_noise
+        self.dirichlet_alpha = dirichlet_alpha
+        self.rng = np.random.default_rng(seed)
+        self.stats: Dict[str, Any] = {}
+        self.root: Optional[_Node] = None
+
+    def select(self, engine: Engine) -> Optional[Action]:
+        return self.search(engine)[0]
+
+    def search(self, engine: Engine) -> Tuple[Optional[Action], Dict[Action, int]]:
+        """Most visited action for the side to move and the root visit counts per action.
+
+        The engine is restored to its position before this returns.
+        """
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        root = self.root = _Node()
+        entry = self._leaf(engine, root, [])
+        if entry is None:
+            return None, {}
+        self._evaluate([entry])
+        if self.root_noise > 0:
+            noise = self.rng.dirichlet(np.full(len(root.priors), self.dirichlet_alpha))
+            root.priors = (1.0 - self.root_noise) * root.priors + self.root_noise * noise
+        sims, calls, sizes, collisions, max_depth = 0, 0, [], 0, 0
+        while True:
+            if deadline is None:
+                if sims >= self.simulations:
+                    break
+            elif time.perf_counter() > deadline and sims:
+                break
+            limit = self.batch_size if deadline is not None else min(self.batch_size, self.simulations - sims)
+            batch = []
+            for _ in range(limit):
+                path, leaf, obs_entry = self._descend(engine, root)
+                max_depth = max(max_depth, len(path))
+                if leaf is None:  # collided with a leaf already queued in this batch
+                    collisions += 1
+                    break
+                if obs_entry is None:  # terminal: its value is already known
+                    self._backup(path, leaf.terminal)
+                    sims += 1
+                else:
+                    batch.append(obs_entry)
+            if batch:
+                self._evaluate(batch)
+                calls += 1
+                sizes.append(len(batch))
+                sims += len(batch)
+        seconds = time.perf_counter() - start
+        counts = {a: int(n) for a, n in zip(root.actions, root.n)}
+        best = root.actions[int(np.argmax(root.n))]
+        self.stats = {
+            "simulations": sims,
+            "seconds": seconds,
+            "sims_per_sec": sims / seconds if seconds > 0 else 0.0,
+            "evaluator_calls": calls,
+            "mean_batch": float(np.mean(sizes)) if sizes else 0.0,
+            "max_batch": max(sizes, default=0),
+            "collisions": collisions,
+            "max_depth": max_depth,
+        }
+        return best, counts
+
+    # ---------- Tree ----------
+    def _descend(self, engine: Engine, root: _Node):
+        """Walk down by PUCT with virtual loss from ``root`` to a leaf.
+
+        Returns ``(path, leaf, entry)`` where ``path`` is the ``(node, edge)`` list taken. ``entry``
+        is the data the evaluator needs for a new leaf, ``None`` for a terminal one; ``leaf`` is
+        ``None`` (and the virtual loss already taken back) when the walk hit a queued leaf.
+        """
+        vl = self.virtual_loss
+        path: List[Tuple[_Node, int]] = []
+        recs = []
+        node = root
+        try:
+            while node.actions is not None and node.terminal is None:
+                sqrt_total = math.sqrt(max(node.visits, 1.0))
+                q = np.divide(node.w, node.n, out=np.zeros_like(node.w), where=node.n > 0)
+                i = int(np.argmax(q + self.c_puct * node.priors * sqrt_total / (1.0 + node.n)))
+                node.n[i] += vl
+                node.w[i] -= vl
+                node.visits += vl
+                path.append((node, i))
+                recs.append(engine.apply(node.actions[i], events=False))
+                child = node.children[i]
+                if child is None:
+                    child = node.children[i] = _Node()
+                node = child
+            if node.pending:
+                self._revert(path)
+                return path, None, None
+            if node.terminal is not None:
+                return path, node, None
+            return path, node, self._leaf(engine, node, path)
+        finally:
+            for rec in reversed(recs):
+                engine.undo(rec)
+
+    def _revert(self, path: List[Tuple[_Node, int]]) -> None:
+        vl = self.virtual_loss
+        for node, i in path:
+            node.n[i] -= vl
+            node.w[i] += vl
+            node.visits -= vl
+
+    def _backup(self, path: List[Tuple[_Node, int]], value: float) -> None:
+        """Back up ``value`` (for the side to move at the leaf) and take the virtual loss back."""
+        vl = self.virtual_loss
+        for node, i in reversed(path):
+            value = -value
+            node.n[i] += 1.0 - vl
+            node.w[i] += value + vl
+            node.visits += 1.0 - vl
+
+    def _leaf(self, engine: Engine, node: _Node, path: List[Tuple[_Node, int]]):
+        """Evaluator input for the engine's position at ``node``, or ``None`` if the game is over
+        there (``node.terminal`` is then set)."""
+        winner = engine.winner_if_any()
+        legal = engine.legal_indices() if winner is None else ()
+        if winner is not None or not len(legal):
+            # a side left without legal actions loses
+            node.terminal = 0.0 if winner == "draw" else 1.0 if winner == engine.state.to_move else -1.0
+            return None
+        node.pending = True
+        side = 0 if engine.state.to_move == "north" else 1
+        return node, path, legal, side, engine.observe(engine.state.to_move).copy()
+
+    def _evaluate(self, batch) -> None:
+        obs = np.stack([entry[4] for entry in batch])
+        legal = [entry[2] for entry in batch]
+        sides = np.array([entry[3] for entry in batch], dtype=np.int64)
+        priors, values = self.evaluator.evaluate(obs, legal, sides)
+        for (node, path, idx, _, _), p, v in zip(batch, priors, values):
+            node.expand([index_action(int(a)) for a in idx], np.asarray(p, dtype=np.float64))
+            node.pending = False
+            if path:
+                self._backup(path, float(v))
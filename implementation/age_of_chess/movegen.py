@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import List, Tuple
-from .game_state import GameState
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from .game_state import GameState, PIECE_ID, PIECE_MASK, SOUTH, side_bit
 from .rules_loader import Ruleset
 from .utils import in_bounds
 
@@ -28,13 +29,16 @@ def is_last_rank(side: str, row: int, rows: int) -> bool:
     return row == (0 if side == "north" else rows - 1)
 
 
-def in_attack_field(side: str, row: int, rows: int) -> bool:
-    depth = min(ATTACK_FIELD_DEPTH, rows)
+def in_attack_field(side: str, row: int, rows: int, depth: int = ATTACK_FIELD_DEPTH) -> bool:
+    depth = min(depth, rows)
     if side == "north":
         return row < depth
     return row >= rows - depth
 
 
+P, N, B, R, Q, K = (PIECE_ID[c] for c in ("P", "N", "B", "R", "Q", "K"))
+
+
 def clear_los(state: GameState, r0:int, c0:int, r1:int, c1:int) -> bool:
     """Forward-only LOS up to distance 2.
     Distance 1: always clear.
@@ -46,95 +50,158 @@ def clear_los(state: GameState, r0:int, c0:int, r1:int, c1:int) -> bool:
         return True
     mid_r = r0 + (dr // 2)
     mid_c = c0 + (dc // 2)
-    return state.board.grid[mid_r][mid_c].top is None
+    return state.board.get(mid_r, mid_c, 0) == 0
 
-def gen_single_moves(state: GameState, rules: Ruleset) -> List[Action]:
-    rows, cols = state.board.rows, state.board.cols
-    side = state.to_move
-    actions: List[Action] = []
+class MoveTables:
+    """Move geometry for one board size and attack-field depth, built once and shared.
 
-    for r in range(rows):
-        for c in range(cols):
-            sq = state.board.grid[r][c]
-            slots = [sq.top, sq.bottom]
-            for slot_idx, u in enumerate(slots):
-                if u is None or u.side != side:
+    Every table is indexed ``[side][square]`` (side 0 north, 1 south; square ``r * cols + c``) and
+    lists targets in the order the generator emits them, so zone rules (attack field, last rank)
+    and bounds checks are already baked in. Target entries carry ``(to_r, to_c, cell)`` where
+    ``cell`` is the packed-board index of the target's top slot.
+    """
+
+    def __init__(self, rows: int, cols: int, attack_depth: int = ATTACK_FIELD_DEPTH):
+        self.rows = rows
+        self.cols = cols
+        self.attack_depth = attack_depth
+        self.coords: List[Tuple[int, int]] = [divmod(sq, cols) for sq in range(rows * cols)]
+        # Single-step moves/melee for every piece except cavalry: (to_r, to_c, cell)
+        self.steps: List[List[List[Tuple[int, int, int]]]] = []
+        # Cavalry targets: (to_r, to_c, cell, melee_allowed)
+        self.cavalry: List[List[List[Tuple[int, int, int, bool]]]] = []
+        # Archer shots: (to_r, to_c, cell, mid_cell) with mid_cell -1 for distance 1
+        self.rays: List[List[List[Tuple[int, int, int, int]]]] = []
+        for side in ("north", "south"):
+            steps, cavalry, rays = [], [], []
+            for r, c in self.coords:
+                steps.append(self._steps(side, r, c))
+                cavalry.append(self._cavalry(side, r, c))
+                rays.append(self._rays(side, r, c))
+            self.steps.append(steps)
+            self.cavalry.append(cavalry)
+            self.rays.append(rays)
+        # Priestess conversion targets are side independent: (to_r, to_c, cell)
+        self.adjacent: List[List[Tuple[int, int, int]]] = [
+            [self._target(r + dr, c + dc) for dr, dc in ALL_DIRS if self._on_board(r + dr, c + dc)]
+            for r, c in self.coords
+        ]
+
+    def _on_board(self, r: int, c: int) -> bool:
+        return in_bounds(r, c, self.rows, self.cols)
+
+    def _target(self, r: int, c: int) -> Tuple[int, int, int]:
+        return (r, c, 2 * (r * self.cols + c))
+
+    def _steps(self, side: str, r: int, c: int) -> List[Tuple[int, int, int]]:
+        if is_last_rank(side, r, self.rows):
+            move_dirs = ALL_DIRS
+        else:
+            move_dirs = list(forward_dirs(side))
+            if in_attack_field(side, r, self.rows, self.attack_depth):
+                move_dirs.extend(d for d in SIDEWAYS_DIRS if d not in move_dirs)
+        return [self._target(r + dr, c + dc) for dr, dc in move_dirs if self._on_board(r + dr, c + dc)]
+
+    def _cavalry(self, side: str, r: int, c: int) -> List[Tuple[int, int, int, bool]]:
+        out: List[Tuple[int, int, int, bool]] = []
+        seen = set()
+
+        def add(rr: int, cc: int, melee: bool) -> None:
+            if self._on_board(rr, cc) and (rr, cc) not in seen:
+                seen.add((rr, cc))
+                out.append(self._target(rr, cc) + (melee,))
+
+        fdirs = forward_dirs(side)
+        for d1 in fdirs:
+            r1, c1 = r + d1[0], c + d1[1]
+            if not self._on_board(r1, c1):
+                continue
+            # the first step may only move; the landing square of the second may also be attacked
+            add(r1, c1, False)
+            for d2 in fdirs:
+                add(r1 + d2[0], c1 + d2[1], True)
+        if is_last_rank(side, r, self.rows):
+            extra_dirs = [d for d in ALL_DIRS if d not in fdirs]
+        elif in_attack_field(side, r, self.rows, self.attack_depth):
+            extra_dirs = SIDEWAYS_DIRS
+        else:
+            extra_dirs = []
+        for dr, dc in extra_dirs:
+            add(r + dr, c + dc, True)
+        return out
+
+    def _rays(self, side: str, r: int, c: int) -> List[Tuple[int, int, int, int]]:
+        out: List[Tuple[int, int, int, int]] = []
+        for dr, dc in forward_dirs(side):
+            for k in (1, 2):
+                rr, cc = r + k * dr, c + k * dc
+                if not self._on_board(rr, cc):
                     continue
-                code = u.code
-                fdirs = forward_dirs(side)
-                attack_field = in_attack_field(side, r, rows)
-                last_rank = is_last_rank(side, r, rows)
-
-                if code == "N":
-                    for d1 in fdirs:
-                        r1, c1 = r + d1[0], c + d1[1]
-                        if not in_bounds(r1,c1,rows,cols): continue
-                        dst1 = state.board.grid[r1][c1]
-                        if dst1.top is None or (dst1.top.side == side and dst1.bottom is None):
-                            actions.append((r,c,slot_idx,r1,c1,0))
-                        for d2 in fdirs:
-                            r2, c2 = r1 + d2[0], c1 + d2[1]
-                            if not in_bounds(r2,c2,rows,cols): continue
-                            dst2 = state.board.grid[r2][c2]
-                            if dst2.top is None or (dst2.top.side == side and dst2.bottom is None):
-                                actions.append((r,c,slot_idx,r2,c2,0))
-                            elif dst2.top and dst2.top.side != side:
-                                actions.append((r,c,slot_idx,r2,c2,1))
-                    extra_dirs: List[Tuple[int, int]]
-                    if last_rank:
-                        extra_dirs = [d for d in ALL_DIRS if d not in fdirs]
-                    elif attack_field:
-                        extra_dirs = SIDEWAYS_DIRS
-                    else:
-                        extra_dirs = []
-                    for dr, dc in extra_dirs:
-                        r1, c1 = r + dr, c + dc
-                        if not in_bounds(r1, c1, rows, cols):
-                            continue
-                        dst = state.board.grid[r1][c1]
-                        if dst.top is None or (dst.top.side == side and dst.bottom is None):
-                            actions.append((r, c, slot_idx, r1, c1, 0))
-                        elif dst.top and dst.top.side != side:
-                            actions.append((r, c, slot_idx, r1, c1, 1))
-                else:
-                    if last_rank:
-                        move_dirs = ALL_DIRS
-                    else:
-                        move_dirs = list(dict.fromkeys(fdirs))
-                        if attack_field:
-                            move_dirs.extend(d for d in SIDEWAYS_DIRS if d not in move_dirs)
-                    for d in move_dirs:
-                        r1, c1 = r + d[0], c + d[1]
-                        if not in_bounds(r1,c1,rows,cols): continue
-                        dst = state.board.grid[r1][c1]
-                        if dst.top is None or (dst.top.side == side and dst.bottom is None):
-                            actions.append((r,c,slot_idx,r1,c1,0))
-                        elif dst.top and dst.top.side != side:
-                            actions.append((r,c,slot_idx,r1,c1,1))
-
-                if code == "B":
-                    is_power = (slot_idx == 0 and sq.bottom is not None and sq.bottom.code == "B") or                                (slot_idx == 1 and sq.top is not None and sq.top.code == "B")
-                    for d in fdirs:
-                        for k in (1,2):
-                            rr, cc = r + k*d[0], c + k*d[1]
-                            if not in_bounds(rr,cc,rows,cols): continue
-                            if not clear_los(state, r, c, rr, cc): continue
-                            tgt_top = state.board.grid[rr][cc].top
-                            if tgt_top and tgt_top.side != side:
-                                if tgt_top.code in ("B","P","Q"):
-                                    actions.append((r,c,slot_idx,rr,cc,2))
-                                elif is_power and tgt_top.code in ("N","R"):
-                                    actions.append((r,c,slot_idx,rr,cc,2))
-
-                if code == "Q":
-                    for dr in (-1,0,1):
-                        for dc in (-1,0,1):
-                            if dr==0 and dc==0: continue
-                            rr,cc = r+dr, c+dc
-                            if not in_bounds(rr,cc,rows,cols): continue
-                            top = state.board.grid[rr][cc].top
-                            bottom = state.board.grid[rr][cc].bottom
-                            if top and top.side != side and bottom is None and top.code not in ("K","Q"):
-                                actions.append((r,c,slot_idx,rr,cc,3))
+                mid = 2 * ((r + dr) * self.cols + (c + dc)) if k == 2 else -1
+                out.append(self._target(rr, cc) + (mid,))
+        return out
+
+
+@lru_cache(maxsize=None)
+def build_move_tables(rows: int, cols: int, attack_depth: int = ATTACK_FIELD_DEPTH) -> MoveTables:
+    return MoveTables(rows, cols, attack_depth)
+
+
+def tables_for(rules: Ruleset) -> MoveTables:
+    board = rules.game.board
+    depth = board.get("zones", {}).get("attack_field", {}).get("depth", ATTACK_FIELD_DEPTH)
+    return build_move_tables(board["rows"], board["cols"], depth)
+
+
+def gen_single_moves(state: GameState, rules: Ruleset, tables: Optional[MoveTables] = None) -> List[Action]:
+    if tables is None:
+        tables = tables_for(rules)
+    cells = state.board.cells
+    own = side_bit(state.to_move)
+    s = 1 if own else 0
+    steps, cavalry, rays, adjacent = tables.steps[s], tables.cavalry[s], tables.rays[s], tables.adjacent
+    ranged, power_shot = rules.combat.ranged, rules.combat.power_shot
+    actions: List[Action] = []
+    append = actions.append
+
+    for sq, (r, c) in enumerate(tables.coords):
+        base = 2 * sq
+        for slot_idx in (0, 1):
+            u = cells[base + slot_idx]
+            if not u or (u & SOUTH) != own:
+                continue
+            code = u & PIECE_MASK
+
+            if code == N:
+                for tr, tc, i, melee in cavalry[sq]:
+                    top = cells[i]
+                    if not top or ((top & SOUTH) == own and not cells[i + 1]):
+                        append((r, c, slot_idx, tr, tc, 0))
+                    elif melee and (top & SOUTH) != own:
+                        append((r, c, slot_idx, tr, tc, 1))
+            else:
+                for tr, tc, i in steps[sq]:
+                    top = cells[i]
+                    if not top or ((top & SOUTH) == own and not cells[i + 1]):
+                        append((r, c, slot_idx, tr, tc, 0))
+                    elif (top & SOUTH) != own:
+                        append((r, c, slot_idx, tr, tc, 1))
+
+            if code == B:
+                is_power = (cells[base + 1 - slot_idx] & PIECE_MASK) == B
+                for tr, tc, i, mid in rays[sq]:
+                    if mid >= 0 and cells[mid]:
+                        continue
+                    tgt_top = cells[i]
+                    if tgt_top and (tgt_top & SOUTH) != own:
+                        tgt_code = tgt_top & PIECE_MASK
+                        if ranged[tgt_code] or (is_power and power_shot[tgt_code]):
+                            append((r, c, slot_idx, tr, tc, 2))
+
+            elif code == Q:
+                for tr, tc, i in adjacent[sq]:
+                    top = cells[i]
+                    if top and (top & SOUTH) != own and not cells[i + 1] and (top & PIECE_MASK) not in (K, Q):
+                        append((r, c, slot_idx, tr, tc, 3))
 
     return actions
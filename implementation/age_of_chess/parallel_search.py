@@ -0,0 +1,139 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+
+from .agents import SearchAgent
+from .env import Engine
+from .game_state import GameState
+from .mcts import MCTSAgent
+from .movegen import Action
+
+SEARCH_MODES = ("root", "trees")
+
+# Per-process search state, set up once by _init_worker.
+_engine: Optional[Engine] = None
+_agent: Any = None
+
+
+def _init_worker(ruleset_path: str, mode: str, agent_kwargs: Dict[str, Any],
+                 evaluator_factory: Optional[Callable[[], Any]]) -> None:
+    global _engine, _agent
+    _engine = Engine(ruleset_path)
+    if mode == "root":
+        _agent = SearchAgent(**agent_kwargs)
+    else:
+        evaluator = evaluator_factory() if evaluator_factory is not None else None
+        _agent = MCTSAgent(evaluator, **agent_kwargs)
+
+
+def _search_root(state: bytes, root_actions: List[Action]) -> Tuple[Optional[Action], int, Dict[str, Any]]:
+    _engine.set_state(GameState.from_bytes(state))
+    action, score = _agent.search(_engine, root_actions)
+    return action, score, _agent.stats
+
+
+def _search_tree(state: bytes, seed: Tuple[int, ...]) -> Tuple[Dict[Action, int], Dict[str, Any]]:
+    _engine.set_state(GameState.from_bytes(state))
+    # independent trees need different root noise to explore differently
+    _agent.rng = np.random.default_rng(seed)
+    _, counts = _agent.search(_engine)
+    return counts, _agent.stats
+
+
+class ParallelSearchAgent:
+    """Search one position on a pool of ``workers`` processes.
+
+    ``mode="root"`` splits the root actions of an alpha-beta ``SearchAgent`` across the workers
+    (dealt round-robin in move-ordering order, so each gets a share of the promising moves) and
+    plays the best-scoring one at the deepest iteration every worker completed; deeper results of
+    faster workers are dropped, since scores from different depths do not compare. ``mode="trees"`` grows an independent ``MCTSAgent`` tree per worker,
+    with root noise, and plays the action with the most visits summed over the trees. Budgets in
+    ``agent_kwargs`` apply per worker. Each worker keeps its own engine; positions travel as
+    ``GameState.to_bytes``. ``stats`` reports per-worker and total node or simulation counts.
+    """
+
+    def __init__(self, ruleset_path: str, workers: Optional[int] = None, mode: str = "root",
+                 evaluator_factory: Optional[Callable[[], Any]] = None, start_method: Optional[str] = None,
+                 seed: int = 0, **agent_kwargs: Any):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.mode = mode
+        if mode == "trees":
+            agent_kwargs.setdefault("root_noise", 0.25)
+        self.seed = seed
+        self._searches = 0
+        self.stats: Dict[str, Any] = {}
+        # used to order root moves before splitting them
+        self._orderer = SearchAgent(max_depth=1)
+        self._pool = ProcessPoolExecutor(
+            self.workers, mp_context=mp.get_context(start_method), initializer=_init_worker,
+            initargs=(ruleset_path, mode, agent_kwargs, evaluator_factory),
+        )
+
+    def select(self, engine: Engine) -> Optional[Action]:
+        legal = engine.legal_actions()
+        if not legal:
+            return None
+        state = engine.state.to_bytes()
+        start = time.perf_counter()
+        if self.mode == "root":
+            return self._root(engine, legal, state, start)
+        return self._trees(state, start)
+
+    def _root(self, engine: Engine, legal: List[Action], state: bytes, start: float) -> Action:
+        ordered = self._orderer._order(engine, legal, None, 0)
+        slices = [ordered[k::self.workers] for k in range(self.workers)]
+        futures = [self._pool.submit(_search_root, state, s) for s in slices if s]
+        results = [f.result() for f in futures]
+        # workers reach different depths; only scores from the same depth are comparable
+        common = min(r[2]["depth"] for r in results)
+        if common:
+            best, score = max((r[2]["iterations"][common - 1][1:] for r in results), key=lambda m: m[1])
+        else:
+            best, score = ordered[0], 0
+        nodes = [r[2]["nodes"] for r in results]
+        seconds = time.perf_counter() - start
+        self.stats = {
+            "workers": len(results),
+            "nodes": sum(nodes),
+            "nodes_per_worker": nodes,
+            "depth": [r[2]["depth"] for r in results],
+            "common_depth": common,
+            "score": score,
+            "seconds": seconds,
+            "nps": sum(nodes) / seconds if seconds > 0 else 0.0,
+        }
+        return best
+
+    def _trees(self, state: bytes, start: float) -> Action:
+        self._searches += 1
+        futures = [self._pool.submit(_search_tree, state, (self.seed, self._searches, k)) for k in range(self.workers)]
+        results = [f.result() for f in futures]
+        visits: Dict[Action, int] = {}
+        for counts, _ in results:
+            for a, n in counts.items():
+                visits[a] = visits.get(a, 0) + n
+        sims = [r[1]["simulations"] for r in results]
+        seconds = time.perf_counter() - start
+        self.stats = {
+            "workers": len(results),
+            "simulations": sum(sims),
+            "simulations_per_worker": sims,
+            "seconds": seconds,
+            "sims_per_sec": sum(sims) / seconds if seconds > 0 else 0.0,
+        }
+        return max(visits, key=visits.get)
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ParallelSearchAgent":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
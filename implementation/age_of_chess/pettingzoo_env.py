@@ -1,39 +1,51 @@
 from __future__ import annotations
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
 from pettingzoo import AECEnv
 from pettingzoo.utils import wrappers
 from gymnasium import spaces
 
 from .env import Engine
-from .rules_loader import load_ruleset
-from .utils import decode_action
+from .rules_loader import compiled_ruleset
+from .game_state import GameState
+from .utils import index_action, LazyInfo, ACTION_SPACE_SIZE, start_probabilities
+from .compact_actions import compact_actions_for, check_encoding
 
 AGENTS = ("north","south")
-ACTION_SPACE_SIZE = 8*8*2*4*8*8
 
 class RawAgeOfChess(AECEnv):
     metadata = {"name": "age_of_chess_v0"}
 
-    def __init__(self, ruleset_path: str):
+    def __init__(self, ruleset_path: str, action_encoding: str = "flat", sparse_legal: bool = False,
+                 start_states: Optional[Sequence[GameState]] = None,
+                 start_weights: Optional[Sequence[float]] = None):
         super().__init__()
         self.ruleset_path = ruleset_path
         self.engine = Engine(ruleset_path)
-        import yaml
-        with open(ruleset_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        self.rewards_cfg = data.get("rewards", {"win":1.0,"loss":-1.0,"draw":0.0,"illegal":-0.01,"step":0.0})
+        # "flat": 32768-way (from_r, from_c, slot, atype, to_r, to_c); "compact": see compact_actions
+        self.action_encoding = check_encoding(action_encoding)
+        self._compact = compact_actions_for(self.engine.rules) if action_encoding == "compact" else None
+        n_actions = self._compact.size if self._compact is not None else ACTION_SPACE_SIZE
+        self._n_actions = n_actions
+        # Publish infos["legal_actions"] (sorted indices); the dense mask is then built only on access.
+        self.sparse_legal = sparse_legal
+        self._mask_key: Optional[int] = None
+        self._mask: Optional[np.ndarray] = None
+        self.rewards_cfg = compiled_ruleset(ruleset_path).rewards
         self.agents = list(AGENTS)
         self.possible_agents = list(AGENTS)
         self.rewards = {a: 0.0 for a in AGENTS}
         self.terminations = {a: False for a in AGENTS}
         self.truncations = {a: False for a in AGENTS}
-        self.infos = {a: {} for a in AGENTS}
+        self.infos = {a: LazyInfo() for a in AGENTS}
         self.agent_selection = "north"
         self._cumulative_rewards = {a: 0.0 for a in AGENTS}
-        self._action_spaces = {a: spaces.Discrete(ACTION_SPACE_SIZE) for a in AGENTS}
+        self._action_spaces = {a: spaces.Discrete(n_actions) for a in AGENTS}
         self._observation_spaces = {a: spaces.Box(0, 1, shape=(12,8,8), dtype=np.int8) for a in AGENTS}
         self.history: List[Dict[str,Any]] = []  # record moves/events
+        # seeded by reset(seed=...); policies may draw from it for per-game randomness
+        self.np_random = np.random.default_rng()
+        self.set_start_states(start_states, start_weights)
 
     def observation_space(self, agent):
         return self._observation_spaces[agent]
@@ -44,26 +56,108 @@ class RawAgeOfChess(AECEnv):
     def reset(self, seed: int | None = None, options: Dict[str,Any] | None = None):
         if options and "ruleset_path" in options:
             self.ruleset_path = options["ruleset_path"]
-        self.engine = Engine(self.ruleset_path)
-        import yaml
-        with open(self.ruleset_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        self.rewards_cfg = data.get("rewards", {"win":1.0,"loss":-1.0,"draw":0.0,"illegal":-0.01,"step":0.0,"events":{}})
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        compiled = compiled_ruleset(self.ruleset_path)
+        if compiled.rules is not self.engine.rules:
+            # another ruleset, or the file changed on disk
+            self.engine = Engine(self.ruleset_path)
+            if self._compact is not None:
+                self._compact = compact_actions_for(self.engine.rules)
+                self._n_actions = self._compact.size
+            self.set_start_states(self._start_states, self._start_p)
+        if options and "start_state" in options:
+            self.engine.reset(options["start_state"])
+        elif self._start_snaps is None:
+            self.engine.reset()
+        else:
+            k = self.np_random.choice(len(self._start_snaps), p=self._start_p)
+            self.engine.reset(self._start_snaps[k])
+        self._mask_key = None
+        self.rewards_cfg = compiled.rewards
         self.agents = list(AGENTS)
         for a in AGENTS:
             self.rewards[a] = 0.0
             self.terminations[a] = False
             self.truncations[a] = False
-            self.infos[a] = {"action_mask": self.engine.action_mask()}
+            self.infos[a] = LazyInfo()
             self._cumulative_rewards[a] = 0.0
-        self.agent_selection = "north"
+        self.agent_selection = self.engine.state.to_move
+        self._publish_legal(self.agent_selection)
         self.history = []
 
+    def set_start_states(self, states: Optional[Sequence[GameState]],
+                         weights: Optional[Sequence[float]] = None) -> None:
+        """Start the next games from ``states`` (sampled by ``weights``) instead of the standard setup.
+
+        Each state is snapshotted once, so resets stay a few buffer copies; call again with new
+        states or weights for a curriculum, or with ``None`` to go back to the standard setup.
+        ``reset(options={"start_state": state})`` starts a single game from ``state``.
+        """
+        self._start_states = None if states is None else [s.copy() for s in states]
+        self._start_p = None
+        self._start_snaps = None
+        if self._start_states is None:
+            return
+        self._start_p = start_probabilities(len(self._start_states), weights)
+        current = self.engine.snapshot()
+        self._start_snaps = []
+        for state in self._start_states:
+            self.engine.reset(state)
+            self.engine.legal_indices()
+            self._start_snaps.append(self.engine.snapshot())
+        self.engine.restore(current)
+        self._mask_key = None
+
     def observe(self, agent):
-        obs = self.engine.observe(agent)
-        self.infos[agent]["action_mask"] = self.engine.action_mask()
+        # copy out of the engine's live view so callers can keep the array
+        obs = np.array(self.engine.observe(agent))
+        if agent == self.agent_selection:
+            self._publish_legal(agent)
         return obs
 
+    def _legal_indices(self):
+        """Sorted legal action indices of the position to move in this env's action encoding."""
+        idx = self.engine.legal_indices()
+        if self._compact is None:
+            return idx
+        return np.sort(self._compact.encode(idx, AGENTS.index(self.engine.state.to_move)))
+
+    def _publish_legal(self, agent):
+        """Expose the legal actions of the current position in the acting ``agent``'s info.
+
+        The dense mask is only built when read (and then cached for the position); the other
+        agent's entries are dropped since it is not to move.
+        """
+        for other in AGENTS:
+            if other != agent:
+                for key in ("action_mask", "legal_actions"):
+                    if key in self.infos[other]:
+                        del self.infos[other][key]
+        info = self.infos[agent]
+        if self.sparse_legal:
+            info["legal_actions"] = self._legal_indices()
+        info.set_lazy("action_mask", self._action_mask)
+
+    def _action_mask(self):
+        """Mask of the position to move in this env's action encoding, cached per position."""
+        key = self.engine.hash
+        if self._mask_key != key:
+            mask = self.engine.action_mask()
+            if self._compact is not None:
+                mask = self._compact.mask(mask, AGENTS.index(self.engine.state.to_move))
+            self._mask_key, self._mask = key, mask
+        return self._mask
+
+    def _decode(self, action):
+        """Engine action for an env action index, or None if the index names no move."""
+        action = int(action)
+        if self._compact is not None:
+            action = int(self._compact.decode(action, AGENTS.index(self.agent_selection)))
+            if action < 0:
+                return None
+        return index_action(action)
+
     def last(self):
         agent = self.agent_selection
         obs = self.observe(agent)
@@ -153,9 +247,9 @@ class RawAgeOfChess(AECEnv):
             self._was_dead_step(action)
             return
 
-        legal = self.engine.legal_actions()
-        decoded = decode_action(int(action))
-        if decoded not in legal:
+        decoded = self._decode(action)
+        if decoded is None or not self.engine.is_legal(decoded):
+            legal = self.engine.legal_actions()
             self.rewards[self.agent_selection] += float(self.rewards_cfg.get("illegal", -0.01))
             self.infos[self.agent_selection]["illegal_action"] = True
             if not legal:
@@ -171,7 +265,7 @@ class RawAgeOfChess(AECEnv):
             self.rewards[self.agent_selection] += step_bonus
 
         # Apply and get event info
-        event = self.engine.apply(decoded)
+        event = self.engine.apply(decoded).event
         event["player"] = self.agent_selection
         self.history.append(event)
 
@@ -186,9 +280,11 @@ class RawAgeOfChess(AECEnv):
 
         # Alternate
         self.agent_selection = "south" if self.agent_selection == "north" else "north"
-        for a in AGENTS:
-            self.infos[a]["action_mask"] = self.engine.action_mask()
+        self._publish_legal(self.agent_selection)
         self._accumulate_rewards()
 
-def age_of_chess_v0(ruleset_path: str):
-    return wrappers.OrderEnforcingWrapper(RawAgeOfChess(ruleset_path))
+def age_of_chess_v0(ruleset_path: str, action_encoding: str = "flat", sparse_legal: bool = False,
+                    start_states: Optional[Sequence[GameState]] = None,
+                    start_weights: Optional[Sequence[float]] = None):
+    return wrappers.OrderEnforcingWrapper(
+        RawAgeOfChess(ruleset_path, action_encoding, sparse_legal, start_states, start_weights))
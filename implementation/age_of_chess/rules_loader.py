@@ -1,7 +1,14 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field
-from typing import Dict, List
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import hashlib
+import os
+import pickle
 import yaml
+from .combat import CombatTables, compile_combat
+
+if TYPE_CHECKING:
+    from .movegen import MoveTables
 
 class PieceSpec(BaseModel):
     label: str
@@ -23,8 +30,86 @@ class GameSpec(BaseModel):
 
 class Ruleset(BaseModel):
     game: GameSpec
+    _combat: Optional[CombatTables] = PrivateAttr(default=None)
 
-def load_ruleset(path: str) -> Ruleset:
+    @property
+    def combat(self) -> CombatTables:
+        """Compiled combat tables (see ``combat.compile_combat``)."""
+        if self._combat is None:
+            self._combat = compile_combat(self)
+        return self._combat
+
+# Reward settings used when a ruleset file has no top-level ``rewards`` block
+DEFAULT_REWARDS = {"win": 1.0, "loss": -1.0, "draw": 0.0, "illegal": -0.01, "step": 0.0, "events": {}}
+
+# Directory for on-disk copies of compiled rulesets; unset keeps the cache in memory only.
+CACHE_DIR_ENV = "AOC_RULESET_CACHE"
+
+def _read_yaml(path: str) -> dict:
     with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
-    return Ruleset(**data)
+        return yaml.safe_load(f)
+
+def _build_ruleset(data: dict) -> Ruleset:
+    rules = Ruleset(**data)
+    rules._combat = compile_combat(rules)
+    return rules
+
+def load_rewards(path: str) -> dict:
+    """The top-level ``rewards`` block of a ruleset file (see README, "Configurable rewards")."""
+    return compiled_ruleset(path).rewards
+
+def load_ruleset(path: str) -> Ruleset:
+    return _build_ruleset(_read_yaml(path))
+
+class CompiledRuleset:
+    """Everything derived from one ruleset file: the validated ``Ruleset`` (with combat tables),
+    its move geometry tables and the parsed ``rewards`` block. Shared read-only by every engine
+    and env of the process."""
+
+    def __init__(self, rules: Ruleset, tables: "MoveTables", rewards: dict):
+        self.rules = rules
+        self.tables = tables
+        self.rewards = rewards
+
+_compiled: Dict[Tuple[str, int, int], CompiledRuleset] = {}
+
+def compiled_ruleset(path: str, cache_dir: Optional[str] = None) -> CompiledRuleset:
+    """Compiled ruleset for ``path``, parsed and validated once per process and file version.
+
+    Entries are keyed by absolute path, mtime and size, so editing the YAML recompiles it. With
+    ``cache_dir`` (or the ``AOC_RULESET_CACHE`` environment variable) compiled rulesets are also
+    pickled to disk, which lets fresh processes such as env workers skip the YAML parse.
+    """
+    from .movegen import tables_for
+
+    full = os.path.abspath(path)
+    st = os.stat(full)
+    key = (full, st.st_mtime_ns, st.st_size)
+    hit = _compiled.get(key)
+    if hit is not None:
+        return hit
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV)
+    pickle_path = None
+    if cache_dir:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        pickle_path = os.path.join(cache_dir, f"ruleset_{digest}.pkl")
+        try:
+            with open(pickle_path, "rb") as f:
+                hit = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            hit = None
+    if hit is None:
+        data = _read_yaml(full)
+        rules = _build_ruleset(data)
+        hit = CompiledRuleset(rules, tables_for(rules), data.get("rewards", dict(DEFAULT_REWARDS)))
+        if pickle_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{pickle_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(hit, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, pickle_path)
+    # drop stale versions of the same file
+    for old in [k for k in _compiled if k[0] == full]:
+        del _compiled[old]
+    _compiled[key] = hit
+    return hit
@@ -1,9 +1,20 @@
 from __future__ import annotations
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional, Sequence
 import numpy as np
 import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space
 
 from .pettingzoo_env import age_of_chess_v0, ACTION_SPACE_SIZE
+from .game_state import GameState, PIECE_ID, PIECES
+from .rules_loader import load_rewards
+from .vec_engine import VecEngine, VecStep, DRAW
+from .compact_actions import compact_actions_for, check_encoding
+
+try:  # optional: only needed to train with stable-baselines3 / sb3-contrib
+    from stable_baselines3.common.vec_env import VecEnv as SB3VecEnv
+except Exception:
+    SB3VecEnv = None
 
 class AOCSingleAgentSelfPlayEnv(gym.Env):
     """
@@ -13,11 +24,11 @@ class AOCSingleAgentSelfPlayEnv(gym.Env):
     """
     metadata = {"render_modes": []}
 
-    def __init__(self, ruleset_path: str):
+    def __init__(self, ruleset_path: str, action_encoding: str = "flat"):
         super().__init__()
-        self._pz = age_of_chess_v0(ruleset_path=ruleset_path)
+        self._pz = age_of_chess_v0(ruleset_path=ruleset_path, action_encoding=action_encoding)
         self._pz.reset()
-        self.action_space = gym.spaces.Discrete(ACTION_SPACE_SIZE)
+        self.action_space = self._pz.action_space("north")
         # Keep channel-first tensor
         self.observation_space = gym.spaces.Box(0,1,shape=(12,8,8), dtype=np.int8)
         self._last_rewards = {"north": 0.0, "south": 0.0}
@@ -36,8 +47,8 @@ class AOCSingleAgentSelfPlayEnv(gym.Env):
         mask = info.get("action_mask")
         if mask is None:
             # fallback to all ones
-            mask = [1]*self.action_space.n
-        return np.array(mask, dtype=np.int8)
+            return np.ones(self.action_space.n, dtype=np.int8)
+        return mask
 
     def step(self, action: int):
         # take one env step for the current agent
@@ -60,3 +71,202 @@ class AOCSingleAgentSelfPlayEnv(gym.Env):
             obs = self._pz.observe(agent)
             info = self._pz.infos.get(agent, {})
         return obs, float(r), done, truncated, info
+
+
+class VecRewards:
+    """The PettingZoo env's reward shaping (``rewards`` block of the ruleset) as array lookups.
+
+    ``__call__`` returns, per board, the acting side's reward minus the opponent's for one
+    ``VecEngine.step``, i.e. what ``AOCSingleAgentSelfPlayEnv.step`` reports for the same move.
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        events = cfg.get("events", {}) or {}
+        penalties = events.get("penalties", {})
+        capture = events.get("capture", {})
+        n = len(PIECES) + 1
+        self.win = float(cfg.get("win", 1.0))
+        self.loss = float(cfg.get("loss", -1.0))
+        self.illegal = float(cfg.get("illegal", -0.01))
+        self.step = float(cfg.get("step", 0.0))
+        self.conversion = float(events.get("conversion", 0.0))
+        self.ranged_kill = float(events.get("ranged_kill", 0.0))
+        self.power_shot_kill = float(events.get("power_shot_kill", 0.0))
+        self.unit_loss = float(penalties.get("unit_loss_default", 0.0))
+        self.death_on_charge = float(penalties.get("death_on_charge", 0.0))
+        default_cap = float(capture.get("default", 0.0))
+        by_attacker = capture.get("by_attacker", {})
+        # indexed by piece id; index 0 (no unit) never scores
+        self.capture_bonus = np.array([0.0] + [float(by_attacker.get(c, default_cap)) for c in PIECES])
+        self.loss_penalty = np.zeros(n)
+        self.loss_penalty[1:] = self.unit_loss
+        self.loss_penalty[PIECE_ID["K"]] = float(penalties.get("king_loss", 0.0))
+
+    def __call__(self, res: VecStep) -> np.ndarray:
+        ev = res.events
+        atype = ev["atype"]
+        applied = atype >= 0
+        melee = atype == 1
+        died = melee & ~ev["att_alive"]
+        charge = died & (ev["actor"] == PIECE_ID["N"]) & (ev["def_top"] == PIECE_ID["P"])
+        r = self.step * applied + self.illegal * res.illegal
+        r += np.where(melee, self.capture_bonus[ev["actor"]], 0.0)
+        r += self.conversion * (atype == 3)
+        r += np.where(atype == 2, np.where(ev["power_shot"], self.power_shot_kill, self.ranged_kill), 0.0)
+        r += self.unit_loss * died + self.death_on_charge * charge
+        # opponent losses count against the opponent, hence for the mover
+        r -= self.loss_penalty[ev["top_killed"]] + self.loss_penalty[ev["bottom_killed"]]
+        decided = res.terminated & (res.winner != DRAW)
+        won = res.winner == res.mover
+        r += np.where(decided, np.where(won, self.win - self.loss, self.loss - self.win), 0.0)
+        return r
+
+
+class AOCSelfPlayVectorEnv(gym.vector.VectorEnv):
+    """
+    ``num_envs`` self-play games stepped together on a ``VecEngine``.
+    Same observations, rewards and masks as ``AOCSingleAgentSelfPlayEnv``, batched;
+    finished games are reset in the same step (``final_obs`` in infos holds their last observation).
+    """
+    metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(self, ruleset_path: str, num_envs: int = 8, max_moves: Optional[int] = None,
+                 action_encoding: str = "flat", start_states: Optional[Sequence[GameState]] = None,
+                 start_weights: Optional[Sequence[float]] = None):
+        super().__init__()
+        self.engine = VecEngine(ruleset_path, num_envs, auto_reset=True, max_moves=max_moves,
+                                start_states=start_states, start_weights=start_weights)
+        self.num_envs = num_envs
+        self.reward_fn = VecRewards(load_rewards(ruleset_path))
+        self.action_encoding = check_encoding(action_encoding)
+        self._compact = compact_actions_for(self.engine.rules) if action_encoding == "compact" else None
+        n_actions = self._compact.size if self._compact is not None else ACTION_SPACE_SIZE
+        self.single_action_space = gym.spaces.Discrete(n_actions)
+        self.single_observation_space = gym.spaces.Box(
+            0, 1, shape=(12, self.engine.rows, self.engine.cols), dtype=np.int8
+        )
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+    def reset(self, *, seed: int | None = None, options: Dict[str, Any] | None = None):
+        super().reset(seed=seed, options=options)
+        if seed is not None:
+            self.engine.rng = np.random.default_rng(seed)
+        self.engine.reset()
+        return self.engine.observe(), {}
+
+    def set_start_states(self, states: Optional[Sequence[GameState]] = None,
+                         weights: Optional[Sequence[float]] = None) -> None:
+        """Start positions for games reset from now on; see ``VecEngine.set_start_states``."""
+        self.engine.set_start_states(states, weights)
+
+    # Batched masks for sb3-contrib; rows follow the observations returned last.
+    def action_masks(self) -> np.ndarray:
+        masks = self.engine.legal_masks()
+        if self._compact is not None:
+            masks = self._compact.masks(masks, self.engine.to_move)
+        return masks.astype(bool)
+
+    def step(self, actions: Sequence[int] | np.ndarray):
+        if self._compact is not None:
+            # compact indices that name no move become -1, which the engine treats as illegal
+            actions = self._compact.to_flat[self.engine.to_move, np.asarray(actions, dtype=np.int64)]
+        res = self.engine.step(actions)
+        rewards = self.reward_fn(res)
+        obs = self.engine.observe()
+        infos: Dict[str, Any] = {"illegal_action": res.illegal, "_illegal_action": res.illegal}
+        done = res.terminated | res.truncated
+        if done.any():
+            final = self.engine.observe_cells(res.final_cells[done], res.final_to_move[done])
+            final_obs = np.empty(self.num_envs, dtype=object)
+            for i, o in zip(np.flatnonzero(done), final):
+                final_obs[i] = o
+            infos["final_obs"] = final_obs
+            infos["_final_obs"] = done
+            infos["winner"] = res.winner
+            infos["_winner"] = done
+        return obs, rewards, res.terminated, res.truncated, infos
+
+
+if SB3VecEnv is not None:
+
+    class AOCSelfPlaySB3VecEnv(SB3VecEnv):
+        """
+        Stable-Baselines3 ``VecEnv`` over ``AOCSelfPlayVectorEnv``, usable directly with
+        ``MaskablePPO`` (``env_method("action_masks")`` returns the batched masks).
+        With ``num_workers`` the games are split across processes (``AOCSubprocVectorEnv``).
+        The games have no env object each: ``get_attr``/``set_attr``/``env_method`` act on the
+        batched env (``self.env``) and repeat its result for every requested index.
+        """
+
+        def __init__(self, ruleset_path: str, num_envs: int = 8, max_moves: Optional[int] = None,
+                     num_workers: int = 0, action_encoding: str = "flat",
+                     start_states: Optional[Sequence[GameState]] = None,
+                     start_weights: Optional[Sequence[float]] = None):
+            if num_workers:
+                from .subproc_env import AOCSubprocVectorEnv
+                self.env = AOCSubprocVectorEnv(ruleset_path, num_envs, num_workers, max_moves,
+                                               action_encoding=action_encoding, start_states=start_states,
+                                               start_weights=start_weights)
+            else:
+                self.env = AOCSelfPlayVectorEnv(ruleset_path, num_envs, max_moves, action_encoding,
+                                                start_states, start_weights)
+            super().__init__(num_envs, self.env.single_observation_space, self.env.single_action_space)
+            self._actions: Optional[np.ndarray] = None
+
+        def reset(self) -> np.ndarray:
+            # VecEnv.seed() stores seed + index per game; the batched env derives the same from the first
+            obs, _ = self.env.reset(seed=self._seeds[0])
+            self._reset_seeds()
+            self._reset_options()
+            return obs
+
+        def step_async(self, actions: np.ndarray) -> None:
+            self._actions = actions
+
+        def step_wait(self):
+            obs, rewards, terminated, truncated, infos = self.env.step(self._actions)
+            dones = terminated | truncated
+            out: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+            for i in np.flatnonzero(dones | infos["illegal_action"]):
+                if infos["illegal_action"][i]:
+                    out[i]["illegal_action"] = True
+                if dones[i]:
+                    out[i]["terminal_observation"] = infos["final_obs"][i]
+                    out[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+            return obs, rewards.astype(np.float32), dones, out
+
+        def action_masks(self) -> np.ndarray:
+            return self.env.action_masks()
+
+        def set_start_states(self, states: Optional[Sequence[GameState]] = None,
+                             weights: Optional[Sequence[float]] = None) -> None:
+            self.env.set_start_states(states, weights)
+
+        def close(self) -> None:
+            self.env.close()
+
+        def _indices(self, indices) -> List[int]:
+            if indices is None:
+                return list(range(self.num_envs))
+            if isinstance(indices, int):
+                return [indices]
+            return list(indices)
+
+        def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+            value = getattr(self.env, attr_name)
+            return [value for _ in self._indices(indices)]
+
+        def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+            setattr(self.env, attr_name, value)
+
+        def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+            idx = self._indices(indices)
+            if method_name == "action_masks":
+                # one batched call instead of one per sub-env
+                return list(self.action_masks()[idx])
+            result = getattr(self.env, method_name)(*method_args, **method_kwargs)
+            return [result for _ in idx]
+
+        def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+            return [False for _ in self._indices(indices)]
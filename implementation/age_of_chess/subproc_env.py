@@ -0,0 +1,252 @@
+from __future__ import annotations
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import multiprocessing as mp
+import os
+import traceback
+import numpy as np
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space
+
+from .compact_actions import compact_actions_for, check_encoding
+from .game_state import GameState
+from .rules_loader import compiled_ruleset
+from .utils import ACTION_SPACE_SIZE
+from .vec_engine import NO_WINNER
+
+
+def _buffer_specs(num_envs: int, ring_size: int, obs_shape: Tuple[int, ...],
+                  n_actions: int) -> Dict[str, Tuple[Tuple[int, ...], Any]]:
+    """Shape and dtype of every shared buffer; the leading axis is the ring slot."""
+    return {
+        "obs": ((ring_size, num_envs) + obs_shape, np.int8),
+        "final_obs": ((ring_size, num_envs) + obs_shape, np.int8),
+        "masks": ((ring_size, num_envs, n_actions), np.int8),
+        "rewards": ((ring_size, num_envs), np.float64),
+        "terminated": ((ring_size, num_envs), np.bool_),
+        "truncated": ((ring_size, num_envs), np.bool_),
+        "illegal": ((ring_size, num_envs), np.bool_),
+        "winner": ((ring_size, num_envs), np.int8),
+    }
+
+
+class _SharedBuffers:
+    """NumPy arrays over ``multiprocessing.shared_memory`` blocks, created once by the parent and
+    attached by name in the workers."""
+
+    def __init__(self, specs: Dict[str, Tuple[Tuple[int, ...], Any]], names: Optional[Dict[str, str]] = None):
+        self._shm: Dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if names is None:
+                shm = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                shm = shared_memory.SharedMemory(name=names[key])
+            self._shm[key] = shm
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if names is None:
+            for arr in self.arrays.values():
+                arr.fill(0)
+
+    @property
+    def names(self) -> Dict[str, str]:
+        return {key: shm.name for key, shm in self._shm.items()}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def close(self, unlink: bool = False) -> None:
+        self.arrays = {}
+        for shm in self._shm.values():
+            shm.close()
+            if unlink:
+                shm.unlink()
+        self._shm = {}
+
+
+def _to_bytes(states: Optional[Sequence[GameState]]) -> Optional[List[bytes]]:
+    return None if states is None else [s.to_bytes() for s in states]
+
+
+def _from_bytes(blobs: Optional[List[bytes]]) -> Optional[List[GameState]]:
+    return None if blobs is None else [GameState.from_bytes(b) for b in blobs]
+
+
+def _worker(remote, parent_remote, ruleset_path: str, start: int, count: int, num_envs: int,
+            ring_size: int, max_moves: Optional[int], action_encoding: str, names: Dict[str, str],
+            start_states: Optional[List[bytes]], start_weights: Optional[Sequence[float]]) -> None:
+    from .sb3_env import AOCSelfPlayVectorEnv
+
+    parent_remote.close()
+    env = AOCSelfPlayVectorEnv(ruleset_path, count, max_moves, action_encoding,
+                               _from_bytes(start_states), start_weights)
+    specs = _buffer_specs(num_envs, ring_size, env.single_observation_space.shape, env.single_action_space.n)
+    bufs = _SharedBuffers(specs, names)
+    rows = slice(start, start + count)
+    try:
+        while True:
+            cmd, slot, data = remote.recv()
+            if cmd == "close":
+                break
+            if cmd == "starts":
+                env.set_start_states(_from_bytes(data[0]), data[1])
+                remote.send(("ok", None))
+                continue
+            if cmd == "reset":
+                obs, _ = env.reset(seed=data)
+                bufs["rewards"][slot, rows] = 0.0
+                bufs["terminated"][slot, rows] = False
+                bufs["truncated"][slot, rows] = False
+                bufs["illegal"][slot, rows] = False
+                bufs["winner"][slot, rows] = NO_WINNER
+            elif cmd == "step":
+                obs, rewards, terminated, truncated, infos = env.step(data)
+                bufs["rewards"][slot, rows] = rewards
+                bufs["terminated"][slot, rows] = terminated
+                bufs["truncated"][slot, rows] = truncated
+                bufs["illegal"][slot, rows] = infos["illegal_action"]
+                bufs["winner"][slot, rows] = infos["winner"] if "winner" in infos else NO_WINNER
+                if "final_obs" in infos:
+                    final = bufs["final_obs"][slot, rows]
+                    for i in np.flatnonzero(infos["_final_obs"]):
+                        final[i] = infos["final_obs"][i]
+            else:
+                raise ValueError(f"Unknown command {cmd!r}")
+            bufs["obs"][slot, rows] = obs
+            np.copyto(bufs["masks"][slot, rows], env.action_masks())
+            remote.send(("ok", None))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        remote.send(("error", traceback.format_exc()))
+    finally:
+        bufs.close()
+        remote.close()
+
+
+class AOCSubprocVectorEnv(gym.vector.VectorEnv):
+    """
+    ``AOCSelfPlayVectorEnv`` split across worker processes.
+
+    Each worker runs a slice of the games on its own ``VecEngine`` and writes observations, masks,
+    rewards and done flags straight into shared memory; only the actions and a ready message cross
+    the pipes. Results live in a ring of ``ring_size`` buffer slots, and the arrays returned by
+    ``reset``/``step``/``action_masks`` are views into the current slot: they stay valid for the
+    next ``ring_size - 1`` steps, copy them to keep them longer.
+    """
+    metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(self, ruleset_path: str, num_envs: int = 8, num_workers: Optional[int] = None,
+                 max_moves: Optional[int] = None, ring_size: int = 2, start_method: Optional[str] = None,
+                 action_encoding: str = "flat", start_states: Optional[Sequence[GameState]] = None,
+                 start_weights: Optional[Sequence[float]] = None):
+        super().__init__()
+        if ring_size < 1:
+            raise ValueError("ring_size must be positive")
+        rules = compiled_ruleset(ruleset_path).rules
+        board = rules.game.board
+        check_encoding(action_encoding)
+        n_actions = compact_actions_for(rules).size if action_encoding == "compact" else ACTION_SPACE_SIZE
+        self.num_envs = num_envs
+        self.num_workers = max(1, min(num_workers or os.cpu_count() or 1, num_envs))
+        self.ring_size = ring_size
+        self.single_action_space = gym.spaces.Discrete(n_actions)
+        self.single_observation_space = gym.spaces.Box(0, 1, shape=(12, board["rows"], board["cols"]), dtype=np.int8)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self._bufs = _SharedBuffers(_buffer_specs(num_envs, ring_size, self.single_observation_space.shape, n_actions))
+        self._slot = 0
+        self._waiting = False
+
+        # contiguous slices of games per worker
+        bounds = np.linspace(0, num_envs, self.num_workers + 1).astype(int)
+        self._slices = [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        ctx = mp.get_context(start_method)
+        self._remotes, self._processes = [], []
+        for s in self._slices:
+            remote, work_remote = ctx.Pipe()
+            args = (work_remote, remote, ruleset_path, s.start, s.stop - s.start, num_envs,
+                    ring_size, max_moves, action_encoding, self._bufs.names, _to_bytes(start_states),
+                    start_weights)
+            proc = ctx.Process(target=_worker, args=args, daemon=True)
+            proc.start()
+            work_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(proc)
+
+    def _wait(self) -> None:
+        errors = []
+        for remote in self._remotes:
+            status, payload = remote.recv()
+            if status == "error":
+                errors.append(payload)
+        self._waiting = False
+        if errors:
+            raise RuntimeError("Worker failed:\n" + errors[0])
+
+    def reset(self, *, seed: int | None = None, options: Dict[str, Any] | None = None):
+        super().reset(seed=seed, options=options)
+        self._slot = (self._slot + 1) % self.ring_size
+        for k, remote in enumerate(self._remotes):
+            remote.send(("reset", self._slot, None if seed is None else seed + k))
+        self._wait()
+        return self._bufs["obs"][self._slot], {}
+
+    def set_start_states(self, states: Optional[Sequence[GameState]] = None,
+                         weights: Optional[Sequence[float]] = None) -> None:
+        """Start positions for games reset from now on; see ``VecEngine.set_start_states``."""
+        for remote in self._remotes:
+            remote.send(("starts", 0, (_to_bytes(states), weights)))
+        self._wait()
+
+    def step_async(self, actions: Sequence[int] | np.ndarray) -> None:
+        actions = np.asarray(actions, dtype=np.int64)
+        self._slot = (self._slot + 1) % self.ring_size
+        for remote, s in zip(self._remotes, self._slices):
+            remote.send(("step", self._slot, actions[s]))
+        self._waiting = True
+
+    def step_wait(self):
+        self._wait()
+        b, slot = self._bufs, self._slot
+        terminated, truncated, illegal = b["terminated"][slot], b["truncated"][slot], b["illegal"][slot]
+        infos: Dict[str, Any] = {"illegal_action": illegal, "_illegal_action": illegal}
+        done = terminated | truncated
+        if done.any():
+            final_obs = np.empty(self.num_envs, dtype=object)
+            for i in np.flatnonzero(done):
+                final_obs[i] = b["final_obs"][slot, i]
+            infos["final_obs"] = final_obs
+            infos["_final_obs"] = done
+            infos["winner"] = b["winner"][slot]
+            infos["_winner"] = done
+        return b["obs"][slot], b["rewards"][slot], terminated, truncated, infos
+
+    def step(self, actions: Sequence[int] | np.ndarray):
+        self.step_async(actions)
+        return self.step_wait()
+
+    # Batched masks for sb3-contrib, viewed in place as bool.
+    def action_masks(self) -> np.ndarray:
+        return self._bufs["masks"][self._slot].view(np.bool_)
+
+    def close(self, **kwargs: Any) -> None:
+        if self.closed:
+            return
+        if self._waiting:
+            self._wait()
+        for remote in self._remotes:
+            try:
+                remote.send(("close", 0, None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for proc in self._processes:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for remote in self._remotes:
+            remote.close()
+        self._bufs.close(unlink=True)
+        self.closed = True
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+
+# Bound flags for search values
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TTEntry:
+    __slots__ = ("key", "depth", "value", "flag", "move", "age")
+
+    def __init__(self, key: int, depth: int, value: Any, flag: int, move: Any, age: int):
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.flag = flag
+        self.move = move
+        self.age = age
+
+
+class TranspositionTable:
+    """Bounded hash table keyed by ``Engine.hash``.
+
+    Each of the ``2**bits`` buckets has two slots: a depth-preferred slot that is only replaced by
+    an equal-or-deeper result (or one from an older search, see ``new_search``) and an
+    always-replace slot that keeps the most recent shallower result.
+    """
+
+    def __init__(self, bits: int = 16):
+        self.size = 1 << bits
+        self._mask = self.size - 1
+        self._deep: List[Optional[TTEntry]] = [None] * self.size
+        self._recent: List[Optional[TTEntry]] = [None] * self.size
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self) -> None:
+        """Age existing entries so the next search may replace them regardless of depth."""
+        self.age += 1
+
+    def get(self, key: int) -> Optional[TTEntry]:
+        b = key & self._mask
+        e = self._deep[b]
+        if e is not None and e.key == key:
+            self.hits += 1
+            return e
+        e = self._recent[b]
+        if e is not None and e.key == key:
+            self.hits += 1
+            return e
+        self.misses += 1
+        return None
+
+    def put(self, key: int, depth: int, value: Any, flag: int = EXACT, move: Any = None) -> None:
+        b = key & self._mask
+        self.stores += 1
+        deep = self._deep[b]
+        entry = TTEntry(key, depth, value, flag, move, self.age)
+        if deep is None or deep.key == key or depth >= deep.depth or deep.age != self.age:
+            if deep is not None and deep.key != key:
+                # demote the old deep entry rather than dropping it outright
+                self._replace_recent(b, deep)
+            self._deep[b] = entry
+        else:
+            self._replace_recent(b, entry)
+
+    def _replace_recent(self, b: int, entry: TTEntry) -> None:
+        old = self._recent[b]
+        if old is not None and old.key != entry.key:
+            self.overwrites += 1
+        self._recent[b] = entry
+
+    def clear(self, counters: bool = True) -> None:
+        """Drop every entry. The hit/miss/store/overwrite counters are reset too unless
+        ``counters`` is False, in which case ``stats`` keeps accumulating across clears."""
+        self._deep = [None] * self.size
+        self._recent = [None] * self.size
+        self.age = 0
+        if counters:
+            self.hits = self.misses = self.stores = self.overwrites = 0
+
+    def __len__(self) -> int:
+        return sum(e is not None for e in self._deep) + sum(e is not None for e in self._recent)
+
+    def stats(self) -> Dict[str, Any]:
+        probes = self.hits + self.misses
+        return {
+            "size": 2 * self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+        }
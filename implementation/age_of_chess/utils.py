@@ -1,10 +1,19 @@
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
 
 # Action encoding:
 # (from_r, from_c, slot_idx, action_type, to_r, to_c)
 # Dimensions: 8 x 8 x 2 x 4 x 8 x 8 = 32768
 DIMS = (8, 8, 2, 4, 8, 8)
+ACTION_SPACE_SIZE = int(np.prod(DIMS))
+# Engine tuples are ordered (from_r, from_c, slot_idx, to_r, to_c, action_type); position k of an
+# engine tuple holds flat-encoding field ENGINE_ORDER[k].
+ENGINE_ORDER = (0, 1, 2, 4, 5, 3)
+# Flat-index stride of each engine-tuple field, so ``engine_actions @ ENGINE_STRIDES`` encodes a batch.
+ENGINE_STRIDES = np.array(
+    [int(np.prod(DIMS[f + 1:])) for f in ENGINE_ORDER], dtype=np.int64
+)
 
 def in_bounds(r: int, c: int, rows: int, cols: int) -> bool:
     return 0 <= r < rows and 0 <= c < cols
@@ -29,9 +38,126 @@ def decode_action(idx:int) -> Tuple[int,int,int,int,int,int]:
     vals = vals[::-1]
     return tuple(vals)  # fr, fc, slot, atype, tr, tc
 
-def action_mask_from_legal(legal: List[Tuple[int,int,int,int,int,int]]) -> List[int]:
-    mask = [0]* (DIMS[0]*DIMS[1]*DIMS[2]*DIMS[3]*DIMS[4]*DIMS[5])
-    for (fr,fc,slot,atype,tr,tc) in legal:
-        i = encode_action(fr,fc,slot,atype,tr,tc)
-        mask[i] = 1
-    return mask
+# Engine actions are ordered (from_r, from_c, slot_idx, to_r, to_c, action_type); these two
+# helpers convert between that tuple and the flat index above.
+def action_index(action: Tuple[int,int,int,int,int,int]) -> int:
+    fr, fc, slot, tr, tc, atype = action
+    return encode_action(fr, fc, slot, atype, tr, tc)
+
+def index_action(idx: int) -> Tuple[int,int,int,int,int,int]:
+    fr, fc, slot, atype, tr, tc = decode_action(idx)
+    return (fr, fc, slot, tr, tc, atype)
+
+def encode_actions(actions: Sequence[Tuple[int,int,int,int,int,int]] | np.ndarray) -> np.ndarray:
+    """Flat indices for a batch of engine-ordered actions, shape ``(n, 6)`` -> ``(n,)``."""
+    arr = np.asarray(actions, dtype=np.int64)
+    if arr.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    return arr.reshape(-1, 6) @ ENGINE_STRIDES
+
+def decode_actions(indices: Sequence[int] | np.ndarray) -> np.ndarray:
+    """Engine-ordered actions, shape ``(n, 6)``, for a batch of flat indices."""
+    fields = np.unravel_index(np.asarray(indices, dtype=np.int64), DIMS)
+    return np.stack([fields[f] for f in ENGINE_ORDER], axis=-1)
+
+def action_mask_from_legal(legal: List[Tuple[int,int,int,int,int,int]], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """``int8`` mask over flat indices for a list of engine-ordered actions, written into ``out`` if given."""
+    if out is None:
+        out = np.zeros(ACTION_SPACE_SIZE, dtype=np.int8)
+    else:
+        out.fill(0)
+    out[encode_actions(legal)] = 1
+    return out
+
+def start_probabilities(n: int, weights: Optional[Sequence[float]] = None) -> Optional[np.ndarray]:
+    """Normalised sampling weights for ``n`` start positions (``None`` means uniform)."""
+    if n < 1:
+        raise ValueError("At least one start position is required")
+    if weights is None:
+        return None
+    p = np.asarray(weights, dtype=np.float64)
+    if p.shape != (n,) or (p < 0).any() or p.sum() <= 0:
+        raise ValueError("start weights must be one non-negative value per start position, not all zero")
+    return p / p.sum()
+
+class LazyInfo(dict):
+    """Info dict whose entries can be computed on first access.
+
+    ``set_lazy(key, fn)`` registers ``fn`` to produce ``info[key]``; ``get``, ``[]``, ``in`` and
+    iteration all see the key, but ``fn`` only runs (once) when the value itself is read.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._lazy: Dict[Any, Callable[[], Any]] = {}
+
+    def set_lazy(self, key: Any, fn: Callable[[], Any]) -> None:
+        dict.pop(self, key, None)
+        self._lazy[key] = fn
+
+    def _resolve(self, key: Any) -> Any:
+        value = self._lazy.pop(key)()
+        dict.__setitem__(self, key, value)
+        return value
+
+    def _resolve_all(self) -> None:
+        for key in list(self._lazy):
+            self._resolve(key)
+
+    def __missing__(self, key: Any) -> Any:
+        if key in self._lazy:
+            return self._resolve(key)
+        raise KeyError(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self._lazy:
+            return self._resolve(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._lazy.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        if self._lazy.pop(key, None) is None:
+            super().__delitem__(key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key in self._lazy:
+            return self._lazy.pop(key)()
+        return super().pop(key, *default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._lazy or super().__contains__(key)
+
+    def __iter__(self):
+        yield from list(super().keys()) + list(self._lazy)
+
+    def __len__(self) -> int:
+        return super().__len__() + len(self._lazy)
+
+    def keys(self):
+        self._resolve_all()
+        return super().keys()
+
+    def items(self):
+        self._resolve_all()
+        return super().items()
+
+    def values(self):
+        self._resolve_all()
+        return super().values()
+
+    def copy(self) -> Dict[Any, Any]:
+        self._resolve_all()
+        return dict(super().items())
+
+    def __repr__(self) -> str:
+        self._resolve_all()
+        return super().__repr__()
+
+    def __eq__(self, other: object) -> bool:
+        self._resolve_all()
+        return super().__eq__(other)
+
+    __hash__ = None  # type: ignore[assignment]
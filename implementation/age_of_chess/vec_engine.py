@@ -0,0 +1,469 @@
+from __future__ import annotations
+from typing import Dict, NamedTuple, Optional, Sequence
+import numpy as np
+
+from .rules_loader import compiled_ruleset, Ruleset
+from .game_state import GameState, Board, standard_setup, SIDES, PIECES, PIECE_MASK, SOUTH
+from .movegen import MoveTables, B, Q, K
+from .utils import DIMS, ACTION_SPACE_SIZE, action_index, start_probabilities
+from .env import PIECE_VAL
+
+# Winner codes returned by VecEngine.step
+NO_WINNER, NORTH_WINS, SOUTH_WINS, DRAW = -1, 0, 1, 2
+
+_N_PIECES = len(PIECES) + 1
+_N_CHANNELS = 2 * len(PIECES)
+# Sentinel larger than any minimal-loss key
+_BIG = 1 << 30
+
+
+class VecStep(NamedTuple):
+    """Per-board result of ``VecEngine.step``; every array has leading dimension ``num_envs``.
+
+    ``events`` holds int8/bool arrays describing the applied action (see ``VecEngine.step``).
+    ``final_cells`` / ``final_to_move`` are the positions right after the action, before finished
+    boards were auto-reset.
+    """
+    actions: np.ndarray
+    illegal: np.ndarray
+    mover: np.ndarray
+    winner: np.ndarray
+    terminated: np.ndarray
+    truncated: np.ndarray
+    events: Dict[str, np.ndarray]
+    final_cells: np.ndarray
+    final_to_move: np.ndarray
+
+
+def _candidate_tables(tables: MoveTables):
+    """Every (target, action type) a piece could use from each packed cell, padded to a common width.
+
+    Returns arrays indexed ``[side][piece][cell][k]``: target top cell, action type, mid cell of a
+    distance-2 shot (-1 if none), validity, flat action index and engine-order sort key. Entries
+    follow the same geometry tables as ``gen_single_moves``; whether they are legal depends on the
+    board and is decided in ``VecEngine._generate``.
+    """
+    rows, cols = tables.rows, tables.cols
+    n_cells = rows * cols * 2
+    lists = [[[[] for _ in range(n_cells)] for _ in range(_N_PIECES)] for _ in range(2)]
+    for s in (0, 1):
+        for sq, (r, c) in enumerate(tables.coords):
+            for slot in (0, 1):
+                for p in range(1, _N_PIECES):
+                    out = lists[s][p][2 * sq + slot]
+                    if p == PIECES.index("N") + 1:
+                        for _, _, i, melee in tables.cavalry[s][sq]:
+                            out.append((i, 0, -1))
+                            if melee:
+                                out.append((i, 1, -1))
+                    else:
+                        for _, _, i in tables.steps[s][sq]:
+                            out.append((i, 0, -1))
+                            out.append((i, 1, -1))
+                    if p == B:
+                        out.extend((i, 2, mid) for _, _, i, mid in tables.rays[s][sq])
+                    elif p == Q:
+                        out.extend((i, 3, -1) for _, _, i in tables.adjacent[sq])
+    width = max(len(out) for side in lists for piece in side for out in piece)
+    shape = (2, _N_PIECES, n_cells, width)
+    cell = np.zeros(shape, dtype=np.int64)
+    atype = np.zeros(shape, dtype=np.int8)
+    mid = np.full(shape, -1, dtype=np.int64)
+    valid = np.zeros(shape, dtype=bool)
+    flat = np.zeros(shape, dtype=np.int64)
+    key = np.zeros(shape, dtype=np.int64)
+    for s in (0, 1):
+        for p in range(1, _N_PIECES):
+            for src in range(n_cells):
+                fr, fc = tables.coords[src >> 1]
+                slot = src & 1
+                for k, (i, at, m) in enumerate(lists[s][p][src]):
+                    tr, tc = tables.coords[i >> 1]
+                    cell[s, p, src, k] = i
+                    atype[s, p, src, k] = at
+                    mid[s, p, src, k] = m
+                    valid[s, p, src, k] = True
+                    flat[s, p, src, k] = action_index((fr, fc, slot, tr, tc, at))
+                    # lexicographic (fr, fc, slot, tr, tc, atype), i.e. the order of sorted(actions)
+                    key[s, p, src, k] = ((src * rows + tr) * cols + tc) * 4 + at
+    return cell, atype, mid, valid, flat, key
+
+
+def _observation_bits() -> np.ndarray:
+    """``bits[perspective][packed]``: one bit per observation channel (own pieces first)."""
+    bits = np.zeros((2, SOUTH + PIECE_MASK + 1), dtype=np.int32)
+    for persp in (0, 1):
+        for v in range(1, SOUTH + PIECE_MASK + 1):
+            p = v & PIECE_MASK
+            if not p or p > len(PIECES):
+                continue
+            channel = p - 1 if (v >> 3) == persp else len(PIECES) + p - 1
+            bits[persp, v] = 1 << channel
+    return bits
+
+
+class VecEngine:
+    """``num_envs`` independent games stepped in lockstep with NumPy.
+
+    Boards are stored as one ``(num_envs, rows * cols * 2)`` ``int8`` array in the packed layout of
+    ``Board.cells``, so ``cells[i]`` and a single ``Engine`` board are byte-for-byte the same.
+    Legal actions (including the minimal-loss rule), combat and winners follow ``Engine`` exactly;
+    finished games are reset to a start position (see ``set_start_states``) when ``auto_reset`` is
+    set.
+    """
+
+    def __init__(self, ruleset_path: str, num_envs: int, auto_reset: bool = True,
+                 max_moves: Optional[int] = None, start_states: Optional[Sequence[GameState]] = None,
+                 start_weights: Optional[Sequence[float]] = None, seed: Optional[int] = None):
+        if num_envs < 1:
+            raise ValueError("num_envs must be positive")
+        compiled = compiled_ruleset(ruleset_path)
+        self.rules: Ruleset = compiled.rules
+        self.rows = self.rules.game.board["rows"]
+        self.cols = self.rules.game.board["cols"]
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.max_moves = max_moves
+        self.tables = compiled.tables
+        self.combat = self.rules.combat
+        (self._cell, self._atype, self._mid, self._valid,
+         self._flat, self._key) = _candidate_tables(self.tables)
+        self._val = np.array(PIECE_VAL, dtype=np.int64)
+        self._obs_bits = _observation_bits()
+        ml = self.rules.game.turn.get("minimal_loss_rule", {})
+        self._minimal_loss = bool(ml.get("enabled", False))
+        self._priority = list(ml.get("priority", ["fewest_losses", "highest_value"]))
+
+        start = standard_setup(self.rows, self.cols)
+        self.initial_cells = np.frombuffer(bytes(start.cells), dtype=np.int8).copy()
+        self.cells = np.tile(self.initial_cells, (num_envs, 1))
+        self.to_move = np.zeros(num_envs, dtype=np.int8)
+        self.move_count = np.zeros(num_envs, dtype=np.int32)
+        self.rng = np.random.default_rng(seed)
+        # Legal-action state for the current positions: dense mask plus what was set in it,
+        # the number of legal actions and the illegal-action fallback (first in engine order).
+        self._mask = np.zeros((num_envs, ACTION_SPACE_SIZE), dtype=np.int8)
+        self._set_rows = np.zeros(0, dtype=np.int64)
+        self._set_idx = np.zeros(0, dtype=np.int64)
+        self.n_legal = np.zeros(num_envs, dtype=np.int32)
+        self._fallback = np.full(num_envs, -1, dtype=np.int64)
+        self.set_start_states(start_states, start_weights)
+        self.reset()
+
+    # ---------- State ----------
+    def set_start_states(self, states: Optional[Sequence[GameState]] = None,
+                         weights: Optional[Sequence[float]] = None) -> None:
+        """Set the pool of start positions that ``reset`` draws from (sampled by ``weights``).
+
+        ``None`` is the standard setup. Legal actions of every pool entry are generated here, so a
+        reset is a row copy plus a mask scatter; call again to change a curriculum.
+        """
+        if states is None:
+            self._start_p = start_probabilities(1, weights)
+            cells = self.initial_cells[None]
+            to_move = np.zeros(1, dtype=np.int8)
+            moves = np.zeros(1, dtype=np.int32)
+        else:
+            states = list(states)
+            self._start_p = start_probabilities(len(states), weights)
+            if any((s.board.rows, s.board.cols) != (self.rows, self.cols) for s in states):
+                raise ValueError("Start state does not match the ruleset board size")
+            cells = np.array([np.frombuffer(bytes(s.board.cells), dtype=np.int8) for s in states])
+            to_move = np.array([SIDES.index(s.to_move) for s in states], dtype=np.int8)
+            moves = np.array([s.move_count for s in states], dtype=np.int32)
+        self._start_cells, self._start_to_move, self._start_moves = cells, to_move, moves
+        local, idx, n_legal, fallback = self._legal_summary(cells, to_move)
+        # legal flat indices of pool entry k are _start_idx[_start_off[k]:_start_off[k + 1]]
+        self._start_idx = idx
+        self._start_off = np.concatenate([[0], np.cumsum(n_legal)])
+        self._start_n_legal, self._start_fallback = n_legal, fallback
+
+    def reset(self, indices: Optional[Sequence[int]] = None) -> None:
+        """Put the given boards (all by default) back to a start position from the pool."""
+        rows = np.arange(self.num_envs) if indices is None else np.asarray(indices, dtype=np.int64)
+        k = len(self._start_cells)
+        pick = np.zeros(len(rows), dtype=np.int64) if k == 1 else self.rng.choice(k, size=len(rows), p=self._start_p)
+        self.cells[rows] = self._start_cells[pick]
+        self.to_move[rows] = self._start_to_move[pick]
+        self.move_count[rows] = self._start_moves[pick]
+        if indices is None:
+            self._mask[self._set_rows, self._set_idx] = 0
+            self._set_rows = self._set_idx = np.zeros(0, dtype=np.int64)
+        else:
+            self._mask[rows] = 0
+        n_legal = self._start_n_legal[pick]
+        # gather each picked entry's slice of the pool's legal indices
+        start = np.repeat(self._start_off[pick], n_legal)
+        within = np.arange(int(n_legal.sum())) - np.repeat(np.cumsum(n_legal) - n_legal, n_legal)
+        self._install(rows, np.repeat(rows, n_legal), self._start_idx[start + within],
+                      n_legal, self._start_fallback[pick])
+
+    def get_state(self, i: int) -> GameState:
+        board = Board(self.rows, self.cols, self.cells[i].tobytes())
+        return GameState(board=board, to_move=SIDES[self.to_move[i]], move_count=int(self.move_count[i]))
+
+    def set_state(self, i: int, state: GameState) -> None:
+        self.cells[i] = np.frombuffer(bytes(state.board.cells), dtype=np.int8)
+        self.to_move[i] = SIDES.index(state.to_move)
+        self.move_count[i] = state.move_count
+        self._refresh(np.array([i]))
+
+    # ---------- Legal actions ----------
+    def _generate(self, cf: np.ndarray, to_move: np.ndarray):
+        """Legal candidates of boards ``cf`` with ``to_move`` to play: ``(legal, flat, key)`` arrays
+        of shape (n, units, k)."""
+        n = len(cf)
+        side = to_move.astype(np.int64)
+        own_bit = (side << 3).astype(np.int8)[:, None]
+        is_own = (cf != 0) & ((cf & SOUTH) == own_bit)
+        units = max(int(is_own.sum(axis=1).max()), 1)
+        # own units first, in cell order
+        pos = np.argsort(~is_own, axis=1, kind="stable")[:, :units]
+        unit = np.take_along_axis(cf, pos, axis=1)
+        piece = np.where(np.take_along_axis(is_own, pos, axis=1), unit & PIECE_MASK, 0).astype(np.int64)
+        at = (side[:, None], piece, pos)
+        valid = self._valid[at]
+        atype = self._atype[at]
+        cell = self._cell[at]
+        mid = self._mid[at]
+
+        b = np.arange(n)[:, None, None]
+        top = cf[b, cell]
+        bot = cf[b, cell + 1]
+        tp = (top & PIECE_MASK).astype(np.int64)
+        occupied = top != 0
+        own_top = occupied & ((top & SOUTH) == own_bit[:, :, None])
+        enemy = occupied & ~own_top
+        free_bottom = bot == 0
+
+        move = valid & (atype == 0) & (~occupied | (own_top & free_bottom))
+        melee = valid & (atype == 1) & enemy
+        mid_clear = (mid < 0) | (cf[b, np.maximum(mid, 0)] == 0)
+        other = np.take_along_axis(cf, pos ^ 1, axis=1) & PIECE_MASK
+        power = (other == B)[:, :, None]
+        ranged = (valid & (atype == 2) & enemy & mid_clear
+                  & (self.combat.ranged_array[tp] | (power & self.combat.power_shot_array[tp])))
+        convert = valid & (atype == 3) & enemy & free_bottom & (tp != K) & (tp != Q)
+        legal = move | melee | ranged | convert
+
+        if self._minimal_loss:
+            # moves, shots and conversions never lose material, so only all-melee boards can trigger
+            hit = np.flatnonzero(legal.any(axis=(1, 2)) & ~(legal & ~melee).any(axis=(1, 2)))
+            if len(hit):
+                legal[hit] = self._minimal_loss_filter(
+                    legal[hit], piece[hit, :, None], top[hit], bot[hit], own_bit[hit], convert[hit])
+        return legal, self._flat[at], self._key[at]
+
+    def _minimal_loss_filter(self, legal, ap, top, bot, own_bit, convert):
+        """Vectorized ``Engine._legal_actions``: when every legal move loses material, keep the
+        moves that are best by the configured priority list."""
+        melee = legal & ~convert
+        val = self._val
+        tp = (top & PIECE_MASK).astype(np.int64)
+        bp = (bot & PIECE_MASK).astype(np.int64)
+        flags = self.combat.melee_array[ap, tp, bp]
+        att_alive, top_alive, bot_alive = flags[..., 0], flags[..., 1], flags[..., 2]
+        bot_present = bot != 0
+        bot_own = bot_present & ((bot & SOUTH) == own_bit[:, :, None])
+        bot_killed = melee & bot_present & ~bot_alive
+        att_lost = melee & (~att_alive | (top_alive & bot_present & bot_alive))
+        own_lost = bot_killed & bot_own
+        own_loss = val[ap] * att_lost + val[bp] * own_lost - val[tp] * convert
+
+        ok = np.where(legal, own_loss, _BIG).min(axis=(1, 2))
+        hit = (ok > 0) & (ok < _BIG)
+        if not hit.any():
+            return legal
+        keys = {
+            "king_safety": lambda: (att_lost & (ap == K)) | (own_lost & (bp == K)),
+            "fewest_losses": lambda: att_lost.astype(np.int64) + own_lost,
+            "highest_value": lambda: own_loss,
+        }
+        keep = legal.copy()
+        for criterion in self._priority:
+            key = keys.get(criterion)
+            if key is None:
+                continue
+            k = np.where(keep, key(), _BIG)
+            best = k.min(axis=(1, 2))
+            keep &= k == best[:, None, None]
+        return np.where(hit[:, None, None], keep, legal)
+
+    def _refresh(self, rows: Optional[np.ndarray] = None) -> None:
+        """Recompute mask, legal counts and fallback for ``rows`` (all boards by default)."""
+        if rows is None:
+            rows = np.arange(self.num_envs)
+            self._mask[self._set_rows, self._set_idx] = 0
+            self._set_rows = self._set_idx = np.zeros(0, dtype=np.int64)
+        else:
+            self._mask[rows] = 0
+        if not len(rows):
+            return
+        local, set_idx, n_legal, fallback = self._legal_summary(self.cells[rows], self.to_move[rows])
+        self._install(rows, rows[local], set_idx, n_legal, fallback)
+
+    def _legal_summary(self, cf: np.ndarray, to_move: np.ndarray):
+        """Legal actions of boards ``cf`` as ``(board, flat index)`` pairs, plus per-board legal
+        counts and illegal-action fallbacks."""
+        legal, flat, key = self._generate(cf, to_move)
+        nz = np.nonzero(legal)
+        n = len(cf)
+        n_legal = legal.reshape(n, -1).sum(axis=1).astype(np.int32)
+        first = np.where(legal, key, np.iinfo(np.int64).max).reshape(n, -1).argmin(axis=1)
+        fallback = np.where(n_legal > 0, flat.reshape(n, -1)[np.arange(n), first], -1)
+        return nz[0], flat[nz], n_legal, fallback
+
+    def _install(self, rows: np.ndarray, set_rows: np.ndarray, set_idx: np.ndarray,
+                 n_legal: np.ndarray, fallback: np.ndarray) -> None:
+        """Write legal actions into the (already cleared) masks of ``rows``."""
+        self._mask[set_rows, set_idx] = 1
+        self._set_rows = np.concatenate([self._set_rows, set_rows])
+        self._set_idx = np.concatenate([self._set_idx, set_idx])
+        self.n_legal[rows] = n_legal
+        self._fallback[rows] = fallback
+
+    def legal_masks(self) -> np.ndarray:
+        """``(num_envs, ACTION_SPACE_SIZE)`` ``int8`` masks of the current positions.
+
+        This is the engine's own buffer and is rewritten by ``step`` / ``reset``; copy it to keep it.
+        """
+        return self._mask
+
+    # ---------- Observations ----------
+    def observe_cells(self, cells: np.ndarray, to_move: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """``(n, 12, rows, cols)`` tensors of ``cells`` from each side-to-move's perspective, laid out
+        like ``Engine.observe``."""
+        n = len(cells)
+        persp = to_move.astype(np.int64)[:, None]
+        bits = self._obs_bits[persp, cells[:, 0::2]] | self._obs_bits[persp, cells[:, 1::2]]
+        planes = (bits[:, None, :] >> np.arange(_N_CHANNELS)[None, :, None]) & 1
+        planes = planes.reshape(n, _N_CHANNELS, self.rows, self.cols)
+        south = to_move == 1
+        planes[south] = planes[south][:, :, ::-1, ::-1]
+        if out is None:
+            return planes.astype(np.int8)
+        np.copyto(out, planes, casting="unsafe")
+        return out
+
+    def observe(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.observe_cells(self.cells, self.to_move, out)
+
+    # ---------- Stepping ----------
+    def step(self, actions: Sequence[int] | np.ndarray) -> VecStep:
+        """Apply one flat-encoded action per board.
+
+        Illegal actions are replaced by the first legal action in engine order (as the PettingZoo
+        env does) and flagged in ``illegal``. A game ends when a king falls or when the side to move
+        is left without legal actions, which counts as a win for the side that just moved.
+
+        ``events`` arrays: ``atype`` (-1 if nothing was applied), ``actor`` piece id, ``att_alive``,
+        ``def_top`` piece id of the target's top unit, ``top_killed`` / ``bottom_killed`` piece ids
+        (0 if none), ``power_shot`` and ``converted`` piece id.
+        """
+        n = self.num_envs
+        acts = np.asarray(actions, dtype=np.int64).reshape(n)
+        rows = np.arange(n)
+        in_range = (acts >= 0) & (acts < ACTION_SPACE_SIZE)
+        illegal = ~in_range
+        illegal[in_range] = self._mask[rows[in_range], acts[in_range]] == 0
+        acts = np.where(illegal, self._fallback, acts)
+        stuck = acts < 0
+        mover = self.to_move.copy()
+
+        events = {
+            "atype": np.full(n, -1, dtype=np.int8),
+            "actor": np.zeros(n, dtype=np.int8),
+            "att_alive": np.ones(n, dtype=bool),
+            "def_top": np.zeros(n, dtype=np.int8),
+            "top_killed": np.zeros(n, dtype=np.int8),
+            "bottom_killed": np.zeros(n, dtype=np.int8),
+            "power_shot": np.zeros(n, dtype=bool),
+            "converted": np.zeros(n, dtype=np.int8),
+        }
+        live = rows[~stuck]
+        if len(live):
+            self._apply(live, acts[live], events)
+            self.to_move[live] ^= 1
+            self.move_count[live] += 1
+
+        cf = self.cells
+        north_king = (cf == K).any(axis=1)
+        south_king = (cf == (K | SOUTH)).any(axis=1)
+        winner = np.full(n, NO_WINNER, dtype=np.int8)
+        winner[north_king & ~south_king] = NORTH_WINS
+        winner[south_king & ~north_king] = SOUTH_WINS
+        winner[~north_king & ~south_king] = DRAW
+        # a side to move without legal actions loses
+        winner[stuck] = 1 - mover[stuck]
+        self._refresh()
+        no_moves = (winner == NO_WINNER) & (self.n_legal == 0)
+        winner[no_moves] = mover[no_moves]
+        terminated = winner != NO_WINNER
+        if self.max_moves is not None:
+            truncated = ~terminated & (self.move_count >= self.max_moves)
+        else:
+            truncated = np.zeros(n, dtype=bool)
+
+        final_cells = cf.copy()
+        final_to_move = self.to_move.copy()
+        done = terminated | truncated
+        if self.auto_reset and done.any():
+            self.reset(np.flatnonzero(done))
+        acts[stuck] = -1
+        return VecStep(acts, illegal, mover, winner, terminated, truncated, events, final_cells, final_to_move)
+
+    def _apply(self, rows: np.ndarray, acts: np.ndarray, events: Dict[str, np.ndarray]) -> None:
+        """Vectorized ``Engine._apply`` for legal ``acts`` on ``rows``."""
+        fr, fc, slot, atype, tr, tc = np.unravel_index(acts, DIMS)
+        si = 2 * (fr * self.cols + fc)
+        di = 2 * (tr * self.cols + tc)
+        cf = self.cells
+        u = cf[rows, si + slot]
+        # removing the unit leaves the other one on top
+        src_top = np.where(slot == 0, cf[rows, si + 1], cf[rows, si])
+        top = cf[rows, di]
+        bot = cf[rows, di + 1]
+        up = (u & PIECE_MASK).astype(np.int64)
+        tp = (top & PIECE_MASK).astype(np.int64)
+        bp = (bot & PIECE_MASK).astype(np.int64)
+        zero = np.zeros_like(top)
+
+        is_move, is_melee, is_ranged, is_convert = (atype == 0), (atype == 1), (atype == 2), (atype == 3)
+        flags = self.combat.melee_array[up, tp, bp]
+        att_alive, top_alive, bot_alive = flags[:, 0], flags[:, 1], flags[:, 2]
+        power = is_ranged & ((src_top & PIECE_MASK) == B) & self.combat.power_shot_array[tp]
+
+        # move/stack: onto an empty top, otherwise below a friendly top
+        new_top = np.where(is_move & (top == 0), u, top)
+        new_bot = np.where(is_move & (top != 0), u, bot)
+        # melee: clear the dead defenders, then a surviving attacker takes the first free slot
+        m_top = np.where(top_alive, top, zero)
+        m_bot = np.where(bot_alive & (bot != 0), bot, zero)
+        place_top = att_alive & (m_top == 0)
+        place_bot = att_alive & ~place_top & (m_bot == 0)
+        m_top = np.where(place_top, u, m_top)
+        m_bot = np.where(place_bot, u, m_bot)
+        new_top = np.where(is_melee, m_top, new_top)
+        new_bot = np.where(is_melee, m_bot, new_bot)
+        # ranged: the top unit dies and the bottom one moves up; convert: the top changes side
+        new_top = np.where(is_ranged, bot, new_top)
+        new_bot = np.where(is_ranged, zero, new_bot)
+        new_top = np.where(is_convert, top ^ SOUTH, new_top)
+        # archers and priestesses are put back on the source square
+        put_back = is_ranged | is_convert
+        src_bot = np.where(put_back & (src_top != 0), u, zero)
+        src_top = np.where(put_back & (src_top == 0), u, src_top)
+
+        cf[rows, si] = src_top
+        cf[rows, si + 1] = src_bot
+        cf[rows, di] = new_top
+        cf[rows, di + 1] = new_bot
+
+        events["atype"][rows] = atype
+        events["actor"][rows] = up
+        events["att_alive"][rows] = ~is_melee | att_alive
+        events["def_top"][rows] = np.where(is_move, 0, tp)
+        events["top_killed"][rows] = np.where((is_melee & ~top_alive) | is_ranged, tp, 0)
+        events["bottom_killed"][rows] = np.where(is_melee & (bot != 0) & ~bot_alive, bp, 0)
+        events["power_shot"][rows] = power
+        events["converted"][rows] = np.where(is_convert, tp, 0)
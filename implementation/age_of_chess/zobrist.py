@@ -0,0 +1,40 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import List
+import random
+
+from .game_state import SOUTH, PIECE_MASK
+
+# Fixed seed so hashes are stable across processes and runs (dedup, shared tables, logs).
+ZOBRIST_SEED = 0xA0C0_2B15
+# One key per packed cell value; 0 (empty) keeps key 0 so clearing a cell XORs nothing in.
+_VALUES = SOUTH + PIECE_MASK + 1
+
+
+class ZobristKeys:
+    """64-bit Zobrist keys for every (square, slot, piece, side) plus the side to move.
+
+    ``cells[i][v]`` is the key of packed value ``v`` in packed-board cell ``i``; the cell index
+    already encodes square and slot, the value encodes piece and side.
+    """
+
+    def __init__(self, n_cells: int, seed: int = ZOBRIST_SEED):
+        rng = random.Random(seed)
+        self.cells: List[List[int]] = [
+            [0] + [rng.getrandbits(64) for _ in range(_VALUES - 1)] for _ in range(n_cells)
+        ]
+        # XOR-ed in while south is to move
+        self.south_to_move = rng.getrandbits(64)
+
+    def hash_cells(self, cells: bytes, to_move: str) -> int:
+        h = self.south_to_move if to_move == "south" else 0
+        keys = self.cells
+        for i, v in enumerate(cells):
+            if v:
+                h ^= keys[i][v]
+        return h
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(n_cells: int) -> ZobristKeys:
+    return ZobristKeys(n_cells)
@@ -4,7 +4,7 @@ import pygame
 from implementation.age_of_chess.pettingzoo_env import age_of_chess_v0
 from implementation.age_of_chess.env import Engine
 from implementation.age_of_chess.agents import GreedyAgent
-from implementation.age_of_chess.utils import encode_action
+from implementation.age_of_chess.utils import action_index
 
 TILE = 72
 W, H = 8*TILE, 8*TILE
@@ -37,7 +37,7 @@ def draw_board(screen, env, show_legal=False):
         for c in range(8):
             color = COLORS["light"] if (r+c)%2==0 else COLORS["dark"]
             pygame.draw.rect(screen, color, (c*TILE, r*TILE, TILE, TILE))
-            sq = engine.state.board.grid[r][c]
+            sq = engine.state.board.square(r, c)
             # draw bottom then top
             y = r*TILE + TILE//2 + 10
             x = c*TILE + TILE//2
@@ -54,7 +54,7 @@ def draw_board(screen, env, show_legal=False):
         legal = engine.legal_actions()
         for fr,fc,slot,tr,tc,atype in legal:
             # determine actor piece at source/slot
-            src = engine.state.board.grid[fr][fc]
+            src = engine.state.board.square(fr, fc)
             actor = (src.top if slot==0 else src.bottom).code if (slot==0 and src.top) or (slot==1 and src.bottom) else "P"
             col = COLORS.get(actor, COLORS["move"])
             cx, cy = tc*TILE + TILE//2, tr*TILE + TILE//2
@@ -122,7 +122,7 @@ def main():
                     engine = env.unwrapped.engine
                     act = greedy.select(engine)
                     if act is not None:
-                        idx = encode_action(*act)
+                        idx = action_index(act)
                         agent = env.agent_selection
                         if env.terminations.get(agent) or env.truncations.get(agent):
                             continue
@@ -139,7 +139,7 @@ def main():
                 legal = engine.legal_actions()
                 if selected is None:
                     # select source if piece present for current side and matches slot
-                    sq = engine.state.board.grid[r][c]
+                    sq = engine.state.board.square(r, c)
                     u = (sq.top if selected_slot==0 else sq.bottom)
                     if u is not None and u.side == env.agent_selection:
                         selected = (r,c)
@@ -150,7 +150,7 @@ def main():
                     if candidates:
                         # if multiple types (e.g., move vs melee), choose melee > convert > ranged > move priority
                         best = sorted(candidates, key=lambda a: {1:0,3:1,2:2,0:3}[a[5]])[0]
-                        idx = encode_action(*best)
+                        idx = action_index(best)
                         agent = env.agent_selection
                         if not (env.terminations.get(agent) or env.truncations.get(agent)):
                             env.step(idx)
@@ -4,7 +4,7 @@ import random
 from implementation.age_of_chess.pettingzoo_env import age_of_chess_v0
 
 def main():
-    env = age_of_chess_v0(ruleset_path="rulesets/default.yaml")
+    env = age_of_chess_v0(ruleset_path="rulesets/default.yaml", sparse_legal=True)
     env.reset()
     episodes = 3
     for ep in range(episodes):
@@ -13,10 +13,9 @@ def main():
         while True:
             agent = env.agent_selection
             info = env.infos[agent]
-            mask = info.get("action_mask")
-            legal_idxs = [i for i, m in enumerate(mask) if m] if mask is not None else None
-            if legal_idxs:
-                action = random.choice(legal_idxs)
+            legal_idxs = info.get("legal_actions")
+            if legal_idxs is not None and len(legal_idxs):
+                action = int(random.choice(legal_idxs))
             else:
                 action = env.action_space(agent).sample()
             env.step(action)
@@ -26,7 +26,7 @@ def draw_board(screen, env):
         for c in range(8):
             color = COLORS["light"] if (r+c)%2==0 else COLORS["dark"]
             pygame.draw.rect(screen, color, (c*TILE, r*TILE, TILE, TILE))
-            sq = engine.state.board.grid[r][c]
+            sq = engine.state.board.square(r, c)
             y = r*TILE + TILE//2 + 10
             x = c*TILE + TILE//2
             for idx, u in enumerate(filter(None, [sq.bottom, sq.top])):
@@ -2,19 +2,12 @@
 import _script_setup  # noqa: F401
 
 from sb3_contrib import MaskablePPO
-from sb3_contrib.common.wrappers import ActionMasker
-from gymnasium.wrappers import FlattenObservation
-from implementation.age_of_chess.sb3_env import AOCSingleAgentSelfPlayEnv
-
-def mask_fn(env):
-    return env.get_action_mask()
+from implementation.age_of_chess.sb3_env import AOCSelfPlaySB3VecEnv
 
 def main():
-    env = AOCSingleAgentSelfPlayEnv("rulesets/default.yaml")
-    # Keep channel-first obs (12,8,8); MaskablePPO MlpPolicy can handle non-flat obs,
-    # but for stability we flatten.
-    env = FlattenObservation(env)
-    env = ActionMasker(env, mask_fn)
+    # 16 self-play games stepped together; masks come from env.action_masks() in one batch.
+    # Observations stay channel-first (12,8,8); MlpPolicy flattens them itself.
+    env = AOCSelfPlaySB3VecEnv("rulesets/default.yaml", num_envs=16)
     model = MaskablePPO("MlpPolicy", env, verbose=1, tensorboard_log="tb_logs/mppo")
     model.learn(total_timesteps=10_000)
     model.save("models/mppo_aoc.zip")
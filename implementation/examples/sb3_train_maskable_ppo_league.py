@@ -25,7 +25,9 @@ class LeagueCallback(BaseCallback):
         if self.n_calls % self.check_freq == 0:
             path = os.path.join(self.save_dir, f"mppo_{self.n_calls}.zip")
             self.model.save(path)
-            # Run a tiny league among Greedy, Random, previous ckpt (if any) and this one
+            # Run a tiny league among Greedy, Random, the search agent and all checkpoints so far.
+            # Results persist in logs/league/results_store.jsonl, so only the new checkpoint's
+            # games against the existing pool are played.
             # Copy to models/ so league can auto-discover
             os.makedirs("models", exist_ok=True)
             import shutil
@@ -3,7 +3,7 @@ import _script_setup  # noqa: F401
 import os, time, json, datetime
 from implementation.age_of_chess.pettingzoo_env import age_of_chess_v0
 from implementation.age_of_chess.agents import GreedyAgent
-from implementation.age_of_chess.utils import encode_action
+from implementation.age_of_chess.utils import action_index
 
 FILES_DIR = "logs"
 
@@ -48,7 +48,7 @@ def main():
             act = agents[agent].select(engine)
             if act is None:
                 break
-            idx = encode_action(*act)
+            idx = action_index(act)
             env.step(idx)
             event = env.unwrapped.history[-1]
             event_record = {"move_no": move_no if agent=='north' else move_no+0.5, "agent": agent, **event}
@@ -1,12 +1,17 @@
 
-import os, glob, json, time, csv, math
+import os, glob, json, time, csv, math, hashlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
 from dataclasses import dataclass
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Tuple, Any, NamedTuple
 
 from implementation.age_of_chess.pettingzoo_env import age_of_chess_v0
-from implementation.age_of_chess.utils import encode_action
-from implementation.age_of_chess.agents import GreedyAgent
+from implementation.age_of_chess.utils import action_index
+from implementation.age_of_chess.agents import GreedyAgent, SearchAgent
+from implementation.age_of_chess.mcts import MCTSAgent, SB3Evaluator
+from implementation.age_of_chess.parallel_search import ParallelSearchAgent
 from .elo import compute_elo, rating_ci
+from .store import ResultsStore, GameKey, file_hash
 
 # Optional imports (skip if unavailable)
 try:
@@ -30,17 +35,30 @@ class Policy:
     name: str
     def select(self, env) -> Optional[int]:
         raise NotImplementedError
+    def select_batch(self, envs: List[Any]) -> List[Optional[int]]:
+        """Actions for several games where this policy is to move; override to batch the work."""
+        return [self.select(env) for env in envs]
+    def close(self) -> None:
+        """Release processes or other resources the policy started (``run_league`` calls this)."""
+    @property
+    def ident(self) -> str:
+        """Identity in the results store; checkpoint-backed policies add their file hash."""
+        return self.name
 
 class RandomPolicy(Policy):
     def __init__(self):
         self.name = "Random"
     def select(self, env):
-        mask = env.infos[env.agent_selection].get("action_mask")
-        legal = [i for i,m in enumerate(mask) if m==1] if mask else list(range(env.action_space(env.agent_selection).n))
-        if not legal:
+        import numpy as np
+        info = env.infos[env.agent_selection]
+        legal = info.get("legal_actions")
+        if legal is None:
+            mask = info.get("action_mask")
+            legal = np.flatnonzero(mask) if mask is not None else np.arange(env.action_space(env.agent_selection).n)
+        if not len(legal):
             return None
-        import random
-        return random.choice(legal)
+        # the env's generator is seeded per game, so games do not depend on how they are interleaved
+        return int(legal[env.unwrapped.np_random.integers(len(legal))])
 
 class GreedyPolicyWrapper(Policy):
     def __init__(self):
@@ -51,8 +69,36 @@ class GreedyPolicyWrapper(Policy):
         act = self._g.select(engine)
         if act is None:
             return None
-        return encode_action(*act)
+        return action_index(act)
 
+class SearchPolicyWrapper(Policy):
+    """Alpha-beta ``SearchAgent``; a node budget and a fresh transposition table per move keep its
+    games reproducible and machine-independent.
+    With ``workers`` > 1 the root moves are split over a process pool, each worker with the full budget.
+    The pool is started on the first move, so only the process that plays games owns one."""
+    def __init__(self, node_limit: int = 4000, max_depth: int = 6, workers: int = 1,
+                 ruleset: str = "rulesets/default.yaml"):
+        self.name = f"Search{node_limit // 1000}k" if node_limit >= 1000 else f"Search{node_limit}"
+        if workers > 1:
+            self.name += f"x{workers}"
+        self.workers = workers
+        self.ruleset = ruleset
+        self._kwargs = dict(max_depth=max_depth, time_limit=None, node_limit=node_limit, reuse_tt=False)
+        self._s: Any = None
+    def select(self, env):
+        if self._s is None:
+            if self.workers > 1:
+                self._s = ParallelSearchAgent(self.ruleset, self.workers, **self._kwargs)
+            else:
+                self._s = SearchAgent(**self._kwargs)
+        act = self._s.select(env.unwrapped.engine)
+        if act is None:
+            return None
+        return action_index(act)
+    def close(self) -> None:
+        if isinstance(self._s, ParallelSearchAgent):
+            self._s.close()
+        self._s = None
 
 def _build_matrix(names, results):
     idx = {n:i for i,n in enumerate(names)}
@@ -120,75 +166,202 @@ class SB3Policy(Policy):
                 pass
         raise RuntimeError(f"Could not load SB3 model from {self.path} (need sb3-contrib or stable-baselines3).")
 
+    @property
+    def ident(self) -> str:
+        return f"{self.name}@{file_hash(self.path)}"
+
     def select(self, env):
-        # Build observation and (optional) mask for the acting agent
-        obs, _, _, _, info = env.last()
-        mask = info.get("action_mask")
-        # SB3 expects batched obs
+        return self.select_batch([env])[0]
+
+    def select_batch(self, envs):
+        # One predict call for the acting agents of all games; masks are stacked alongside
         import numpy as np
-        bobs = np.expand_dims(obs, axis=0)
+        obs, masks = [], []
+        for env in envs:
+            o, _, _, _, info = env.last()
+            obs.append(o)
+            masks.append(info.get("action_mask"))
+        bobs = np.stack(obs)
         if self.is_maskable:
-            action, _ = self.model.predict(bobs, deterministic=True, action_masks=mask)
+            action, _ = self.model.predict(bobs, deterministic=True, action_masks=np.stack(masks))
         else:
             action, _ = self.model.predict(bobs, deterministic=True)
-        # unwrap scalar
-        try:
-            return int(action.item())
-        except Exception:
-            return int(action)
+        return [int(x) for x in np.asarray(action).reshape(-1)]
+
+class MCTSPolicy(Policy):
+    """``MCTSAgent`` using an SB3 checkpoint's policy/value network as prior and evaluator."""
+    def __init__(self, base: SB3Policy, simulations: int = 200, batch_size: int = 16):
+        self.name = f"MCTS{simulations}:{os.path.basename(base.path)}"
+        self.base = base
+        self.simulations = simulations
+        self.batch_size = batch_size
+        self._mcts: Optional[MCTSAgent] = None
+    @property
+    def ident(self) -> str:
+        return f"{self.name}@{file_hash(self.base.path)}"
+    def select(self, env):
+        engine = env.unwrapped.engine
+        if self._mcts is None:
+            evaluator = SB3Evaluator(self.base.model, engine.rules)
+            self._mcts = MCTSAgent(evaluator, simulations=self.simulations, batch_size=self.batch_size)
+        act = self._mcts.select(engine)
+        if act is None:
+            return None
+        return action_index(act)
 
-def discover_agents(models_dir: str = "models") -> List[Policy]:
+def discover_agents(models_dir: str = "models", search_nodes: int = 4000, mcts_sims: int = 0,
+                    search_workers: int = 1, ruleset: str = "rulesets/default.yaml") -> List[Policy]:
     agents: List[Policy] = [GreedyPolicyWrapper(), RandomPolicy()]
+    if search_nodes:
+        agents.append(SearchPolicyWrapper(node_limit=search_nodes, workers=search_workers, ruleset=ruleset))
     for p in glob.glob(os.path.join(models_dir, "*.zip")):
         # Try to instantiate SB3Policy; if libs missing, skip gracefully
         try:
-            agents.append(SB3Policy(p))
+            policy = SB3Policy(p)
         except Exception:
             # Unavailable libs or bad file — skip
             continue
+        agents.append(policy)
+        if mcts_sims:
+            agents.append(MCTSPolicy(policy, simulations=mcts_sims))
     return agents
 
-def play_game(white: Policy, black: Policy, ruleset: str, max_steps: int = 200) -> Result:
-    env = age_of_chess_v0(ruleset_path=ruleset)
-    env.reset()
-    steps = 0
-    while steps < max_steps:
-        agent = env.agent_selection
-        pol = white if agent == "north" else black
-        action = pol.select(env)
-        if action is None:
-            # no legal move: env will handle terminal on step with illegal fallback; choose a random illegal to trigger
-            action = 0
-        env.step(action)
-        steps += 1
-        if env.terminations["north"] and env.terminations["south"]:
-            break
-    # Determine winner by rewards sign or king capture was already encoded
-    rw = env.rewards
-    winner = None
-    if rw["north"] > rw["south"]:
-        winner = "north"
-    elif rw["south"] > rw["north"]:
-        winner = "south"
-    return Result(white=white.name, black=black.name, winner=winner, rewards=dict(rw), steps=steps)
-
-def run_league(ruleset: str = "rulesets/default.yaml", games_per_pair: int = 4, models_dir: str = "models", out_dir: str = "logs/league"):
+def play_games(white: Policy, black: Policy, ruleset: str, seeds: List[Optional[int]],
+               max_steps: int = 200) -> List[Result]:
+    """Play one game per seed in lockstep. Each round, the games where the same policy is to move
+    get their actions from one ``select_batch`` call (a single batched ``predict`` for SB3
+    policies); finished games drop out. Each game is the same as when played alone."""
+    # sparse legal indices for the built-in policies; SB3 policies still get the dense mask on request
+    envs = [age_of_chess_v0(ruleset_path=ruleset, sparse_legal=True) for _ in seeds]
+    for env, seed in zip(envs, seeds):
+        env.reset(seed=seed)
+    steps = [0] * len(envs)
+    active = list(range(len(envs)))
+    while active:
+        to_move: Dict[str, List[int]] = {"north": [], "south": []}
+        for i in active:
+            to_move[envs[i].agent_selection].append(i)
+        for agent, pol in (("north", white), ("south", black)):
+            group = to_move[agent]
+            if not group:
+                continue
+            for i, action in zip(group, pol.select_batch([envs[i] for i in group])):
+                if action is None:
+                    # no legal move: env will handle terminal on step with illegal fallback; choose a random illegal to trigger
+                    action = 0
+                envs[i].step(action)
+                steps[i] += 1
+        active = [i for i in active if steps[i] < max_steps
+                  and not (envs[i].terminations["north"] and envs[i].terminations["south"])]
+    results = []
+    for env, n in zip(envs, steps):
+        # Determine winner by rewards sign or king capture was already encoded
+        rw = env.rewards
+        winner = None
+        if rw["north"] > rw["south"]:
+            winner = "north"
+        elif rw["south"] > rw["north"]:
+            winner = "south"
+        results.append(Result(white=white.name, black=black.name, winner=winner, rewards=dict(rw), steps=n))
+    return results
+
+def play_game(white: Policy, black: Policy, ruleset: str, max_steps: int = 200, seed: Optional[int] = None) -> Result:
+    return play_games(white, black, ruleset, [seed], max_steps)[0]
+
+class Game(NamedTuple):
+    white: str
+    black: str
+    round: int  # index of the game within its pairing
+    seed: int
+
+def _game_seed(seed: int, white: str, black: str, k: int) -> int:
+    digest = hashlib.sha1(f"{seed}:{white}:{black}:{k}".encode()).hexdigest()
+    return int(digest[:8], 16)
+
+def schedule_games(names: List[str], games_per_pair: int, seed: int = 0) -> List[Game]:
+    """Every game of the league, colors alternating within a pairing. A game's seed depends only
+    on the pairing and its round, not on the rest of the pool or on where it is played."""
+    games = []
+    for i in range(len(names)):
+        for j in range(i+1, len(names)):
+            for k in range(games_per_pair):
+                white, black = (names[i], names[j]) if k % 2 == 0 else (names[j], names[i])
+                games.append(Game(white, black, k, _game_seed(seed, white, black, k)))
+    return games
+
+# Per-process league state, set up once by _init_league_worker.
+_worker_agents: Dict[str, Policy] = {}
+_worker_ruleset = ""
+_worker_max_steps = 200
+
+def _init_league_worker(ruleset: str, agent_kwargs: Dict[str, Any], max_steps: int) -> None:
+    global _worker_agents, _worker_ruleset, _worker_max_steps
+    try:  # one torch thread per process; the pool provides the parallelism
+        import torch
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+    _worker_ruleset = ruleset
+    _worker_max_steps = max_steps
+    _worker_agents = {a.name: a for a in discover_agents(ruleset=ruleset, **agent_kwargs)}
+    # pools started by the policies end with this worker; the priority runs this before
+    # multiprocessing closes the pools' queues at exit
+    Finalize(None, _close_policies, args=(list(_worker_agents.values()),), exitpriority=100)
+
+def _close_policies(policies: List[Policy]) -> None:
+    for pol in policies:
+        pol.close()
+
+def _play_scheduled(games: List[Game]) -> List[Result]:
+    white, black = _worker_agents[games[0].white], _worker_agents[games[0].black]
+    return play_games(white, black, ruleset=_worker_ruleset, seeds=[g.seed for g in games],
+                      max_steps=_worker_max_steps)
+
+def _lockstep_chunks(games: List[Game], size: int) -> List[List[int]]:
+    """Positions in ``games`` grouped by (white, black), in chunks of up to ``size`` games."""
+    by_pair: Dict[Tuple[str, str], List[int]] = {}
+    for i, g in enumerate(games):
+        by_pair.setdefault((g.white, g.black), []).append(i)
+    return [idx[k:k + size] for idx in by_pair.values() for k in range(0, len(idx), size)]
+
+def run_league(ruleset: str = "rulesets/default.yaml", games_per_pair: int = 4, models_dir: str = "models", out_dir: str = "logs/league",
+               search_nodes: int = 4000, mcts_sims: int = 0, search_workers: int = 1, workers: int = 1, seed: int = 0,
+               store_path: Optional[str] = "", concurrent: int = 8, max_steps: int = 200, fresh: bool = False):
+    """Play the league and write standings. Results are kept in ``store_path`` (default
+    ``<out_dir>/results_store.jsonl``; ``None`` disables it), keyed by players, ruleset, round, seed
+    and ``max_steps``, and only games missing from it are played. ``fresh`` replays every game and
+    records the new results in the store.
+    Up to ``concurrent`` games with the same colors are played in lockstep (see ``play_games``)."""
     os.makedirs(out_dir, exist_ok=True)
-    agents = discover_agents(models_dir=models_dir)
+    agent_kwargs = dict(models_dir=models_dir, search_nodes=search_nodes, mcts_sims=mcts_sims,
+                        search_workers=search_workers)
+    agents = discover_agents(ruleset=ruleset, **agent_kwargs)
     names = [a.name for a in agents]
-    # standings: points (win=1, draw=0.5)
-    points: Dict[str, float] = {n: 0.0 for n in names}
-    results: List[Dict[str,Any]] = []
-    for i in range(len(agents)):
-        for j in range(i+1, len(agents)):
-            a, b = agents[i], agents[j]
-            for k in range(games_per_pair):
-                # alternate colors
-                if k % 2 == 0:
-                    white, black = a, b
-                else:
-                    white, black = b, a
-                res = play_game(white, black, ruleset=ruleset)
+    by_name = {a.name: a for a in agents}
+    ids = {a.name: a.ident for a in agents}
+    rules_id = file_hash(ruleset)
+    if store_path == "":
+        store_path = os.path.join(out_dir, "results_store.jsonl")
+    store = ResultsStore(store_path) if store_path else None
+    games = schedule_games(names, games_per_pair, seed)
+    keys = [GameKey(ids[g.white], ids[g.black], rules_id, g.round, g.seed, max_steps) for g in games]
+    todo = [(g, key) for g, key in zip(games, keys) if fresh or store is None or key not in store]
+    print(f"League: {len(games)} games, {len(todo)} to play")
+    played: Dict[GameKey, Dict[str, Any]] = {}
+    chunks = _lockstep_chunks([g for g, _ in todo], max(1, concurrent))
+    pool = None
+    if workers > 1 and len(chunks) > 1:
+        # each worker loads every policy once; chunks come back in order
+        pool = ProcessPoolExecutor(workers, initializer=_init_league_worker, initargs=(ruleset, agent_kwargs, max_steps))
+        outcomes = pool.map(_play_scheduled, [[todo[i][0] for i in c] for c in chunks])
+    else:
+        outcomes = (play_games(by_name[todo[c[0]][0].white], by_name[todo[c[0]][0].black], ruleset=ruleset,
+                               seeds=[todo[i][0].seed for i in c], max_steps=max_steps) for c in chunks)
+    try:
+        # store results as chunks finish
+        for c, chunk_results in zip(chunks, outcomes):
+            for i, res in zip(c, chunk_results):
+                key = todo[i][1]
                 rec = {
                     "white": res.white,
                     "black": res.black,
@@ -196,17 +369,31 @@ def run_league(ruleset: str = "rulesets/default.yaml", games_per_pair: int = 4,
                     "rewards": res.rewards,
                     "steps": res.steps,
                 }
-                results.append(rec)
-                # assign points
-                if res.winner is None:
-                    points[res.white] += 0.5
-                    points[res.black] += 0.5
-                elif res.winner == "north":
-                    points[res.white] += 1.0
-                else:
-                    points[res.black] += 1.0
-
-    # write JSONL
+                played[key] = rec
+                if store is not None:
+                    store.add(key, rec)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _close_policies(agents)
+
+    # standings from every game of the current pool, stored or new, in schedule order
+    fields = ("white", "black", "winner", "rewards", "steps")
+    results: List[Dict[str,Any]] = []
+    for key in keys:
+        rec = played.get(key) or store.get(key)
+        results.append({f: rec[f] for f in fields})
+    # standings: points (win=1, draw=0.5)
+    points: Dict[str, float] = {n: 0.0 for n in names}
+    for r in results:
+        if r["winner"] is None:
+            points[r["white"]] += 0.5
+            points[r["black"]] += 0.5
+        elif r["winner"] == "north":
+            points[r["white"]] += 1.0
+        else:
+            points[r["black"]] += 1.0
+
     ts = time.strftime("%Y%m%d_%H%M%S")
     jsonl_path = os.path.join(out_dir, f"league_{ts}.jsonl")
     with open(jsonl_path, "w") as jf:
@@ -247,5 +434,17 @@ if __name__ == "__main__":
     p.add_argument("--games", type=int, default=4, help="Games per pairing (alternates colors)")
     p.add_argument("--models", default="models", help="Directory with SB3 model .zip files")
     p.add_argument("--out", default="logs/league")
+    p.add_argument("--search-nodes", type=int, default=4000, help="Node budget per move of the alpha-beta agent (0 leaves it out)")
+    p.add_argument("--mcts-sims", type=int, default=0, help="Also enter an MCTS agent with this many simulations per move for each SB3 model")
+    p.add_argument("--search-workers", type=int, default=1, help="Processes for the alpha-beta agent's root-parallel search")
+    p.add_argument("--workers", type=int, default=1, help="Play games on this many processes")
+    p.add_argument("--seed", type=int, default=0, help="Base of the per-game seeds")
+    p.add_argument("--store", default="", help="Results store to reuse and extend (default: <out>/results_store.jsonl)")
+    p.add_argument("--fresh", action="store_true", help="Replay every game, overwriting its stored result")
+    p.add_argument("--max-steps", type=int, default=200, help="Plies before a game is scored as it stands")
+    p.add_argument("--concurrent", type=int, default=8, help="Games of a pairing played in lockstep, batching SB3 inference")
     args = p.parse_args()
-    run_league(ruleset=args.ruleset, games_per_pair=args.games, models_dir=args.models, out_dir=args.out)
+    run_league(ruleset=args.ruleset, games_per_pair=args.games, models_dir=args.models, out_dir=args.out,
+               search_nodes=args.search_nodes, mcts_sims=args.mcts_sims, search_workers=args.search_workers,
+               workers=args.workers, seed=args.seed, store_path=args.store,
+               concurrent=args.concurrent, max_steps=args.max_steps, fresh=args.fresh)
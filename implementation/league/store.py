@@ -0,0 +1,66 @@
+from __future__ import annotations
+import hashlib, json, os
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+def file_hash(path: str) -> str:
+    """Short content hash of a file (model checkpoint, ruleset)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+class GameKey(NamedTuple):
+    """Identity of one league game: who played which color, under which ruleset, which of the
+    pairing's games it was (``round``), and the settings that decide how it plays out."""
+    white: str   # agent id: name, plus the model file hash for checkpoints
+    black: str
+    ruleset: str  # ruleset file hash
+    round: int
+    seed: int
+    max_steps: int
+
+class ResultsStore:
+    """Append-only JSONL of league results keyed by ``GameKey``.
+
+    Results survive between ``run_league`` calls, so a league only plays the games its current
+    pool has not played yet; a changed model or ruleset file gets a new key and is replayed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._results: Dict[GameKey, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    rec = json.loads(line)
+                    # records written before seeds were keyed never match a current key
+                    key = GameKey(rec["white_id"], rec["black_id"], rec["ruleset"], rec["round"],
+                                  rec.get("seed"), rec.get("max_steps"))
+                    self._results[key] = rec
+
+    def __contains__(self, key: GameKey) -> bool:
+        return key in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __iter__(self) -> Iterator[GameKey]:
+        return iter(self._results)
+
+    def get(self, key: GameKey) -> Optional[Dict[str, Any]]:
+        return self._results.get(key)
+
+    def add(self, key: GameKey, result: Dict[str, Any]) -> None:
+        """Record ``result`` (white, black, winner, rewards, steps) under ``key`` and append it to disk.
+        A later record for the same key replaces the earlier one when the store is read back."""
+        rec = dict(result, white_id=key.white, black_id=key.black, ruleset=key.ruleset, round=key.round,
+                   seed=key.seed, max_steps=key.max_steps)
+        self._results[key] = rec
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(rec) + "\n")
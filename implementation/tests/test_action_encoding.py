@@ -0,0 +1,53 @@
+import numpy as np
+from implementation.age_of_chess.env import Engine
+from implementation.age_of_chess.utils import (
+    action_index, index_action, encode_actions, decode_actions, action_mask_from_legal, ACTION_SPACE_SIZE,
+)
+
+def test_batched_encoding_matches_scalar():
+    legal = Engine("rulesets/default.yaml").legal_actions()
+    idx = encode_actions(legal)
+    assert idx.tolist() == [action_index(a) for a in legal]
+    assert [tuple(a) for a in decode_actions(idx).tolist()] == [index_action(int(i)) for i in idx]
+
+def test_engine_mask_buffer_tracks_position():
+    engine = Engine("rulesets/default.yaml")
+    mask = engine.action_mask()
+    assert mask.dtype == np.int8 and mask.shape == (ACTION_SPACE_SIZE,)
+    expected = action_mask_from_legal(engine.legal_actions())
+    assert np.array_equal(mask, expected)
+    engine.apply(engine.legal_actions()[0])
+    assert np.array_equal(engine.action_mask(), action_mask_from_legal(engine.legal_actions()))
+    assert int(engine.action_mask().sum()) == len(set(engine.legal_actions()))
+
+def test_compact_encoding_covers_legal_moves():
+    import random
+    from implementation.age_of_chess.compact_actions import compact_actions_for
+    from implementation.age_of_chess.pettingzoo_env import age_of_chess_v0
+    engine = Engine("rulesets/default.yaml")
+    compact = compact_actions_for(engine.rules)
+    assert compact.size < ACTION_SPACE_SIZE // 4
+    rng = random.Random(4)
+    for _ in range(60):
+        legal = engine.legal_actions_unfiltered()
+        if not legal or engine.winner_if_any():
+            break
+        side = 0 if engine.state.to_move == "north" else 1
+        flat = encode_actions(legal)
+        k = compact.encode(flat, side)
+        assert (k >= 0).all() and np.array_equal(compact.decode(k, side), flat)
+        mask = compact.mask(engine.action_mask(), side)
+        assert int(mask.sum()) == len(set(engine.legal_actions()))
+        engine.apply(rng.choice(sorted(set(legal))))
+    # the same compact index is the mirrored move for south
+    north_push = compact.encode(action_index((6, 3, 0, 5, 3, 0)), 0)
+    assert compact.decode(north_push, 1) == action_index((1, 4, 0, 2, 4, 0))
+
+    env = age_of_chess_v0("rulesets/default.yaml", action_encoding="compact")
+    env.reset()
+    for _ in range(6):
+        agent = env.agent_selection
+        _, _, _, _, info = env.last()
+        assert info["action_mask"].shape == (compact.size,)
+        env.step(int(np.flatnonzero(info["action_mask"])[0]))
+        assert not env.infos[agent].get("illegal_action")
@@ -0,0 +1,15 @@
+from implementation.age_of_chess.game_state import GameState, standard_setup, Unit
+
+def test_board_square_view():
+    board = standard_setup(8, 8)
+    sq = board.square(7, 4)
+    assert sq.top == Unit("K", "north") and sq.bottom is None
+    assert board.is_empty(4, 4)
+    assert sum(1 for _ in board.units()) == 32
+
+def test_state_bytes_roundtrip():
+    state = GameState(board=standard_setup(8, 8), to_move="south", move_count=7)
+    state.board.remove_unit(6, 0, 0)
+    clone = GameState.from_bytes(state.to_bytes())
+    assert clone.board == state.board
+    assert clone.to_move == "south" and clone.move_count == 7
@@ -0,0 +1,68 @@
+import implementation.league.round_robin as round_robin
+from implementation.league.round_robin import (schedule_games, play_game, play_games, RandomPolicy, GreedyPolicyWrapper,
+                                              SearchPolicyWrapper)
+from implementation.league.store import ResultsStore, GameKey
+
+RULES = "rulesets/default.yaml"
+
+def test_schedule_seeds_and_seeded_games_reproduce():
+    games = schedule_games(["A", "B", "C"], 2, seed=10)
+    assert [(g.white, g.black, g.round) for g in games[:2]] == [("A", "B", 0), ("B", "A", 1)]
+    # a game's seed does not depend on the rest of the pool
+    assert games[:2] == schedule_games(["A", "B"], 2, seed=10)
+    assert len({g.seed for g in games}) == len(games)
+    first = play_game(RandomPolicy(), GreedyPolicyWrapper(), RULES, max_steps=60, seed=3)
+    again = play_game(RandomPolicy(), GreedyPolicyWrapper(), RULES, max_steps=60, seed=3)
+    assert first == again
+
+def test_results_store_persists(tmp_path):
+    path = str(tmp_path / "store.jsonl")
+    store = ResultsStore(path)
+    key = GameKey("SB3:a.zip@123", "Greedy", "abc", 1, 7, 200)
+    store.add(key, {"white": "SB3:a.zip", "black": "Greedy", "winner": None, "rewards": {}, "steps": 3})
+    reloaded = ResultsStore(path)
+    assert key in reloaded and len(reloaded) == 1
+    assert reloaded.get(key)["steps"] == 3 and GameKey("SB3:a.zip@456", "Greedy", "abc", 1, 7, 200) not in reloaded
+    assert GameKey("SB3:a.zip@123", "Greedy", "abc", 1, 8, 200) not in reloaded
+
+class _BatchRecorder(RandomPolicy):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+    def select_batch(self, envs):
+        self.batches.append(len(envs))
+        return super().select_batch(envs)
+
+def test_lockstep_games_batch_and_match_single_games():
+    white, black = _BatchRecorder(), _BatchRecorder()
+    seeds = [1, 2, 3, 4]
+    results = play_games(white, black, RULES, seeds, max_steps=40)
+    assert white.batches[0] == len(seeds) and max(black.batches) == len(seeds)
+    # finished games drop out of the batches
+    assert sum(white.batches) + sum(black.batches) == sum(r.steps for r in results)
+    assert results == [play_game(RandomPolicy(), RandomPolicy(), RULES, max_steps=40, seed=s) for s in seeds]
+
+def test_run_league_keys_games_by_seed_and_step_limit(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(round_robin, "_save_heatmap", lambda *args: None)
+    store = str(tmp_path / "store.jsonl")
+    def run(seed=0, max_steps=10, fresh=False):
+        round_robin.run_league(RULES, games_per_pair=2, models_dir=str(tmp_path), out_dir=str(tmp_path),
+                               search_nodes=0, seed=seed, store_path=store, max_steps=max_steps, fresh=fresh)
+        return capsys.readouterr().out
+    assert "2 to play" in run()
+    assert "0 to play" in run()
+    assert "2 to play" in run(seed=1)
+    assert "2 to play" in run(max_steps=12)
+    # a fresh run replays its games and still records them
+    assert "2 to play" in run(fresh=True)
+    assert len(open(store).read().splitlines()) == 8
+    assert len(round_robin.ResultsStore(store)) == 6
+
+def test_search_pool_starts_on_first_move_and_closes():
+    policy = SearchPolicyWrapper(node_limit=200, max_depth=2, workers=2, ruleset=RULES)
+    assert policy.name == "Search200x2" and policy._s is None
+    result = play_game(policy, RandomPolicy(), RULES, max_steps=4, seed=0)
+    procs = list(policy._s._pool._processes.values())
+    policy.close()
+    assert result.steps == 4 and policy._s is None
+    assert procs and not any(p.is_alive() for p in procs)
@@ -16,3 +16,78 @@ def test_illegal_penalty_path():
     env.step(0)
     # No assertion on value, but check we didn't crash and possibly flagged
     assert "illegal_action" in env.infos[agent] or True
+
+def test_masked_actions_are_accepted():
+    import random
+    rng = random.Random(3)
+    env = age_of_chess_v0(ruleset_path="rulesets/default.yaml")
+    env.reset()
+    for _ in range(30):
+        agent = env.agent_selection
+        _, _, term, trunc, info = env.last()
+        if term or trunc:
+            break
+        legal = [i for i, m in enumerate(info["action_mask"]) if m]
+        env.step(rng.choice(legal))
+        assert "illegal_action" not in env.infos[agent]
+
+def test_sparse_legal_actions_and_lazy_mask():
+    import numpy as np
+    from implementation.age_of_chess.utils import LazyInfo
+    env = age_of_chess_v0(ruleset_path="rulesets/default.yaml", sparse_legal=True)
+    env.reset()
+    for _ in range(5):
+        info = env.infos[env.agent_selection]
+        legal = info["legal_actions"]
+        assert np.all(np.diff(legal) > 0)
+        assert np.array_equal(legal, env.unwrapped.engine.legal_indices())
+        assert "action_mask" in info
+        assert np.array_equal(np.flatnonzero(info["action_mask"]), legal)
+        env.step(int(legal[0]))
+
+    calls = []
+    info = LazyInfo(a=1)
+    info.set_lazy("b", lambda: calls.append(1) or 2)
+    assert "b" in info and sorted(info) == ["a", "b"] and len(info) == 2 and not calls
+    assert info.get("b") == 2 and info["b"] == 2 and calls == [1]
+    assert dict(info) == {"a": 1, "b": 2}
+
+def test_mask_only_for_acting_agent_and_lazy():
+    import numpy as np
+    from implementation.age_of_chess.utils import action_index
+    env = age_of_chess_v0(ruleset_path="rulesets/default.yaml")
+    env.reset()
+    engine = env.unwrapped.engine
+    calls = []
+    generate = engine._legal_actions
+    engine._legal_actions = lambda: calls.append(1) or generate()
+    for _ in range(4):
+        env.step(action_index(engine.legal_actions()[0]))
+        other = "south" if env.agent_selection == "north" else "north"
+        assert "action_mask" not in env.infos[other]
+        assert "action_mask" in env.infos[env.agent_selection]
+    # one move generation per position after the start (reset restores its legal actions from a
+    # snapshot), none for masks that were never read
+    assert len(calls) == 3
+    mask = env.infos[env.agent_selection]["action_mask"]
+    assert len(calls) == 4 and np.array_equal(np.flatnonzero(mask), engine.legal_indices())
+
+def test_snapshot_reset_and_start_states():
+    from implementation.age_of_chess.env import Engine
+    engine = Engine("rulesets/default.yaml", debug=True)
+    start = engine.state.to_bytes()
+    engine.apply(engine.legal_actions()[0])
+    snap = engine.snapshot()
+    engine.apply(engine.legal_actions()[0])
+    engine.reset()
+    engine.check_tracking()
+    assert engine.state.to_bytes() == start and engine.legal_actions() == Engine("rulesets/default.yaml").legal_actions()
+    engine.reset(snap)
+    engine.check_tracking()
+    assert engine.state.to_move == "south" and bytes(engine.state.board.cells) == snap.cells
+
+    env = age_of_chess_v0("rulesets/default.yaml", start_states=[engine.state])
+    env.reset(seed=1)
+    assert env.agent_selection == "south" and env.unwrapped.engine.state.to_bytes() == engine.state.to_bytes()
+    env.reset(options={"start_state": Engine("rulesets/default.yaml").state})
+    assert env.agent_selection == "north"
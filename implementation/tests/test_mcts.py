@@ -0,0 +1,75 @@
+from implementation.age_of_chess.env import Engine
+from implementation.age_of_chess.game_state import Board, GameState
+import numpy as np
+import pytest
+from implementation.age_of_chess.mcts import MCTSAgent, MaterialEvaluator, SB3Evaluator
+from implementation.age_of_chess.utils import ACTION_SPACE_SIZE
+
+RULES = "rulesets/default.yaml"
+
+class CountingEvaluator(MaterialEvaluator):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+    def evaluate(self, obs, legal, sides):
+        self.batches.append(len(obs))
+        assert obs.shape[1:] == (12, 8, 8) and len(legal) == len(sides) == len(obs)
+        return super().evaluate(obs, legal, sides)
+
+def test_mcts_batches_leaves_and_restores_engine():
+    engine = Engine(RULES)
+    key = engine.hash
+    evaluator = CountingEvaluator()
+    agent = MCTSAgent(evaluator, simulations=96, batch_size=8)
+    action, counts = agent.search(engine)
+    assert engine.hash == key and engine.is_legal(action)
+    assert sum(counts.values()) == agent.stats["simulations"] == 96
+    # the root goes alone, then virtual loss spreads each batch over distinct leaves
+    assert evaluator.batches[0] == 1 and max(evaluator.batches[1:]) == 8
+    assert agent.stats["mean_batch"] > 4 and agent.stats["sims_per_sec"] > 0
+
+def test_mcts_finds_king_capture():
+    board = Board(8, 8)
+    board.add_unit(7, 0, "K", "north")
+    board.add_unit(4, 4, "R", "north")
+    board.add_unit(3, 4, "K", "south")
+    board.add_unit(3, 5, "N", "south")
+    engine = Engine(RULES)
+    engine.set_state(GameState(board, "north"))
+    action = MCTSAgent(simulations=200, batch_size=4).select(engine)
+    engine.apply(action)
+    assert engine.winner_if_any() == "north"
+
+class _StubDistribution:
+    def __init__(self, probs):
+        self.distribution = type("Dist", (), {"probs": probs})()
+
+class _StubPolicy:
+    """Maskable actor-critic stand-in: masked uniform policy, value 2.0 (clipped to 1)."""
+    def __init__(self, th):
+        self.th = th
+        self.batches = []
+    def obs_to_tensor(self, obs):
+        return self.th.as_tensor(obs), True
+    def get_distribution(self, obs, action_masks=None):
+        self.batches.append(len(obs))
+        probs = action_masks / action_masks.sum(axis=1, keepdims=True)
+        return _StubDistribution(self.th.as_tensor(probs))
+    def predict_values(self, obs):
+        return self.th.full((len(obs), 1), 2.0)
+
+def test_sb3_evaluator_batches_through_the_policy():
+    th = pytest.importorskip("torch")
+    policy = _StubPolicy(th)
+    model = type("Model", (), {"policy": policy, "action_space": type("Space", (), {"n": ACTION_SPACE_SIZE})()})()
+    evaluator = SB3Evaluator(model)
+    assert evaluator.is_maskable
+    engine = Engine(RULES)
+    legal = engine.legal_indices()
+    obs = np.stack([engine.observe(engine.state.to_move)] * 3)
+    priors, values = evaluator.evaluate(obs, [legal] * 3, np.zeros(3, dtype=np.int64))
+    assert policy.batches == [3] and list(values) == [1.0] * 3
+    assert all(np.allclose(p, 1.0 / len(legal)) for p in priors)
+    agent = MCTSAgent(evaluator, simulations=32, batch_size=8)
+    assert engine.is_legal(agent.select(engine))
+    assert max(policy.batches[1:]) == 8
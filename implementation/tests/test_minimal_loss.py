@@ -0,0 +1,34 @@
+import random
+from implementation.age_of_chess.env import Engine
+
+def test_predicted_outcome_matches_apply():
+    engine = Engine("rulesets/default.yaml")
+    rng = random.Random(2)
+    for _ in range(80):
+        legal = engine.legal_actions_unfiltered()
+        if not legal or engine.winner_if_any():
+            break
+        side = engine.state.to_move
+        opp = "south" if side == "north" else "north"
+        before = engine._material()
+        for a in legal:
+            out = engine.predict_outcome(a)
+            rec = engine.apply(a, events=False)
+            after = engine._material()
+            engine.undo(rec)
+            assert (out.own_loss, out.opp_loss) == (before[side] - after[side], before[opp] - after[opp])
+        engine.apply(rng.choice(sorted(set(legal))))
+
+def test_minimal_loss_priority_order():
+    from implementation.age_of_chess.env import Outcome
+    engine = Engine("rulesets/default.yaml")
+    acts = engine.legal_actions_unfiltered()[:4]
+    fake = {
+        acts[0]: Outcome(1000, 0, 1, True),   # loses the king
+        acts[1]: Outcome(5, 3, 1, False),
+        acts[2]: Outcome(1, 0, 1, False),     # cheapest single loss
+        acts[3]: Outcome(2, 0, 2, False),
+    }
+    engine.legal_actions_unfiltered = lambda: acts
+    engine.predict_outcome = fake.__getitem__
+    assert engine.legal_actions() == [acts[2]]
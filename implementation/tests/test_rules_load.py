@@ -4,3 +4,56 @@ def test_rules_load():
     rules = load_ruleset("rulesets/default.yaml")
     assert rules.game.board["rows"] == 8
     assert "P" in rules.game.pieces
+
+def test_combat_tables_from_interactions(tmp_path):
+    import yaml, pytest
+    from implementation.age_of_chess.combat import resolve_melee
+    from implementation.age_of_chess.game_state import PIECES, PIECE_ID as ID
+    rules = load_ruleset("rulesets/default.yaml")
+    # the default interactions declare the reference outcomes
+    for att in PIECES:
+        for top in PIECES:
+            for bottom in (None,) + PIECES:
+                b = ID[bottom] if bottom else 0
+                assert rules.combat.melee[ID[att]][ID[top]][b] == resolve_melee(att, top, bottom)
+    assert rules.combat.ranged[ID["P"]] and not rules.combat.ranged[ID["N"]]
+    assert rules.combat.power_shot[ID["R"]]
+
+    with open("rulesets/default.yaml", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    data["game"]["pieces"]["N"]["interactions"]["vs"]["pikeman"] = {"lone": "lose", "pair": "lose", "stack": "win"}
+    path = tmp_path / "variant.yaml"
+    path.write_text(yaml.safe_dump(data), encoding="utf-8")
+    variant = load_ruleset(str(path))
+    assert variant.combat.melee[ID["N"]][ID["P"]][ID["B"]] == (True, False, True)
+    assert variant.combat.melee[ID["N"]][ID["P"]][0] == rules.combat.melee[ID["N"]][ID["P"]][0]
+
+    data["game"]["pieces"]["N"]["interactions"]["vs"]["pikeman"] = "win_lone_defender"
+    path.write_text(yaml.safe_dump(data), encoding="utf-8")
+    with pytest.raises(ValueError, match="unknown melee outcome"):
+        load_ruleset(str(path))
+
+def test_compiled_ruleset_cache(tmp_path, monkeypatch):
+    import os, shutil
+    from implementation.age_of_chess.rules_loader import compiled_ruleset
+    from implementation.age_of_chess.env import Engine
+    path = tmp_path / "rules.yaml"
+    shutil.copy("rulesets/default.yaml", path)
+    first = compiled_ruleset(str(path))
+    assert compiled_ruleset(str(path)) is first
+    assert Engine(str(path)).rules is first.rules
+    assert first.rewards["win"] == 1.0
+    # editing the file recompiles it
+    path.write_text(path.read_text().replace("win: 1.0", "win: 2.0"))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    second = compiled_ruleset(str(path))
+    assert second is not first and second.rewards["win"] == 2.0
+    # on-disk copies are reused by a cold cache
+    from implementation.age_of_chess import rules_loader
+    cache = tmp_path / "cache"
+    rules_loader._compiled.clear()
+    compiled_ruleset(str(path), cache_dir=str(cache))
+    assert len(list(cache.iterdir())) == 1
+    rules_loader._compiled.clear()
+    monkeypatch.setattr(rules_loader, "_read_yaml", None)
+    assert compiled_ruleset(str(path), cache_dir=str(cache)).rewards["win"] == 2.0
@@ -0,0 +1,114 @@
+from implementation.age_of_chess.env import Engine
+from implementation.age_of_chess.game_state import Board, GameState
+from implementation.age_of_chess.agents import SearchAgent, WIN
+
+RULES = "rulesets/default.yaml"
+
+def test_search_takes_the_king_and_restores_engine():
+    board = Board(8, 8)
+    board.add_unit(7, 0, "K", "north")
+    board.add_unit(4, 4, "R", "north")
+    board.add_unit(3, 4, "K", "south")
+    board.add_unit(3, 5, "N", "south")
+    engine = Engine(RULES, debug=True)
+    engine.set_state(GameState(board, "north"))
+    key, before = engine.hash, bytes(engine.state.board.cells)
+    agent = SearchAgent(max_depth=3, time_limit=None)
+    action, score = agent.search(engine)
+    assert engine.hash == key and bytes(engine.state.board.cells) == before
+    assert score >= WIN - 10 and agent.stats["depth"] >= 1
+    engine.apply(action)
+    assert engine.winner_if_any() == "north"
+
+class _KingLossDraws(Engine):
+    """Variant where losing a king draws the game, as when a trade removes both last kings."""
+    def winner_if_any(self):
+        return None if super().winner_if_any() is None else "draw"
+
+def test_quiescence_scores_a_drawing_capture_as_a_draw():
+    board = Board(8, 8)
+    board.add_unit(7, 0, "K", "north")
+    board.add_unit(4, 4, "R", "north")
+    board.add_unit(3, 4, "K", "south")
+    engine = _KingLossDraws(RULES)
+    engine.set_state(GameState(board, "north"))
+    agent = SearchAgent(max_depth=1, time_limit=None)
+    # the king capture is the only material-winning move, and it ends the game in a draw
+    action, score = agent.search(engine)
+    assert score < WIN - 10
+    agent._nodes, agent._deadline = 0, None
+    assert agent._quiesce(engine, -WIN, WIN, 0, 2) == agent.evaluate(engine)
+
+def test_search_respects_node_budget_and_is_deterministic():
+    engine = Engine(RULES)
+    moves = []
+    for _ in range(2):
+        agent = SearchAgent(max_depth=8, time_limit=None, node_limit=1500)
+        moves.append(agent.select(engine))
+        assert agent.stats["nodes"] <= 1501 and agent.stats["nps"] > 0
+        assert 1 <= agent.stats["depth"] < 8
+    assert moves[0] == moves[1] and engine.is_legal(moves[0])
+    # restricted root, e.g. one slice of a split search
+    root = engine.legal_actions()[:3]
+    action, _ = SearchAgent(max_depth=2, time_limit=None).search(engine, root)
+    assert action in root
+
+def test_parallel_search_splits_root_and_merges():
+    from implementation.age_of_chess.parallel_search import ParallelSearchAgent
+    engine = Engine(RULES)
+    key = engine.hash
+    with ParallelSearchAgent(RULES, workers=2, max_depth=2, time_limit=None) as agent:
+        action = agent.select(engine)
+        assert engine.hash == key and engine.is_legal(action)
+        assert agent.stats["workers"] == 2 and len(agent.stats["nodes_per_worker"]) == 2
+        assert agent.stats["nodes"] == sum(agent.stats["nodes_per_worker"]) > 0
+        # splitting the root does not change a full-width fixed-depth result
+        single = SearchAgent(max_depth=2, time_limit=None)
+        _, score = single.search(engine)
+        assert agent.stats["score"] == score and agent.stats["common_depth"] == 2
+        assert single.search(engine, [action])[1] == score
+    # under a node budget the workers stop at different depths; the move comes from the depth both completed
+    import random
+    rng = random.Random(0)
+    for _ in range(16):
+        engine.apply(rng.choice(engine.legal_actions()))
+    with ParallelSearchAgent(RULES, workers=2, max_depth=6, time_limit=None, node_limit=1500) as agent:
+        action = agent.select(engine)
+        assert sorted(agent.stats["depth"]) == [2, 3] and agent.stats["common_depth"] == 2
+        _, score = SearchAgent(max_depth=2, time_limit=None).search(engine)
+        assert agent.stats["score"] == score
+        assert SearchAgent(max_depth=2, time_limit=None).search(engine, [action])[1] == score
+    with ParallelSearchAgent(RULES, workers=2, mode="trees", simulations=32, batch_size=8) as agent:
+        assert engine.is_legal(agent.select(engine))
+        assert agent.stats["simulations_per_worker"] == [32, 32]
+
+def test_greedy_vectorized_scores_match_apply():
+    import random
+    from implementation.age_of_chess.agents import GreedyAgent, score_action, score_actions
+    engine = Engine(RULES)
+    rng = random.Random(2)
+    for _ in range(120):
+        legal = engine.legal_actions()
+        if not legal or engine.winner_if_any():
+            break
+        expected = [score_action(engine, a) for a in legal]
+        assert score_actions(engine).tolist() == expected
+        assert GreedyAgent().select(engine) == legal[expected.index(max(expected))]
+        engine.apply(rng.choice(legal))
+
+def test_greedy_vectorized_scores_on_mixed_side_stack():
+    from implementation.age_of_chess.agents import score_action, score_actions
+    board = Board(8, 8)
+    board.add_unit(7, 0, "K", "north")
+    board.add_unit(0, 7, "K", "south")
+    board.add_unit(5, 3, "N", "north")
+    # south archer on top of a north archer: the cavalry tramples both
+    board.add_unit(3, 3, "B", "south")
+    board.add_unit(3, 3, "B", "north")
+    engine = Engine(RULES)
+    engine.set_state(GameState(board, "north"))
+    legal = engine.legal_actions()
+    expected = [score_action(engine, a) for a in legal]
+    assert score_actions(engine).tolist() == expected
+    trample = [a for a in legal if a[:2] == (5, 3) and a[3:5] == (3, 3) and a[5] == 1]
+    assert trample and score_action(engine, trample[0]) == 0
@@ -0,0 +1,29 @@
+import numpy as np
+from implementation.age_of_chess.sb3_env import AOCSelfPlayVectorEnv
+from implementation.age_of_chess.subproc_env import AOCSubprocVectorEnv
+
+def test_subproc_env_matches_in_process_env():
+    ref = AOCSelfPlayVectorEnv("rulesets/default.yaml", num_envs=5)
+    env = AOCSubprocVectorEnv("rulesets/default.yaml", num_envs=5, num_workers=2)
+    try:
+        obs, _ = env.reset()
+        ref_obs, _ = ref.reset()
+        rng = np.random.default_rng(0)
+        ended = 0
+        for _ in range(60):
+            assert np.array_equal(obs, ref_obs)
+            masks = env.action_masks()
+            assert np.array_equal(masks, ref.action_masks())
+            acts = np.array([rng.choice(np.flatnonzero(m)) for m in masks])
+            obs, rewards, term, trunc, infos = env.step(acts)
+            ref_obs, ref_rewards, ref_term, _, ref_infos = ref.step(acts)
+            assert np.array_equal(rewards, ref_rewards)
+            assert np.array_equal(term, ref_term)
+            assert ("winner" in infos) == ("winner" in ref_infos)
+            for i in np.flatnonzero(term):
+                assert np.array_equal(infos["final_obs"][i], ref_infos["final_obs"][i])
+                assert infos["winner"][i] == ref_infos["winner"][i]
+                ended += 1
+        assert ended
+    finally:
+        env.close()
@@ -0,0 +1,32 @@
+import random
+from implementation.age_of_chess.env import Engine
+
+def test_apply_undo_roundtrip():
+    engine = Engine("rulesets/default.yaml", debug=True)
+    rng = random.Random(1)
+    seen_types = set()
+    for _ in range(80):
+        legal = engine.legal_actions_unfiltered()
+        if not legal or engine.winner_if_any():
+            break
+        snapshot = engine.state.to_bytes()
+        for a in legal:
+            rec = engine.apply(a)
+            seen_types.add(a[5])
+            engine.undo(rec)
+            assert engine.state.to_bytes() == snapshot
+        engine.apply(rng.choice(sorted(set(legal))))
+    assert seen_types == {0, 1, 2, 3}
+
+def test_observation_view_follows_apply_undo():
+    import numpy as np
+    engine = Engine("rulesets/default.yaml")
+    start = {a: np.array(engine.observe(a)) for a in ("north", "south")}
+    rec = engine.apply((6, 3, 0, 5, 3, 0))
+    view = engine.observe("north")
+    assert view[0, 5, 3] == 1 and view[0, 6, 3] == 0
+    assert engine.observe("south")[6, 2, 4] == 1
+    engine.undo(rec)
+    out = np.empty_like(start["north"])
+    assert np.array_equal(engine.observe("north", out=out), start["north"])
+    assert not view.flags.writeable
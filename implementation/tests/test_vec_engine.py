@@ -0,0 +1,82 @@
+import numpy as np
+from implementation.age_of_chess.env import Engine
+from implementation.age_of_chess.game_state import Board, GameState
+from implementation.age_of_chess.utils import index_action, action_index, opponent
+from implementation.age_of_chess.vec_engine import VecEngine, NO_WINNER
+
+RULES = "rulesets/default.yaml"
+
+def _mask(engine):
+    out = np.zeros(32768, dtype=np.int8)
+    return engine.action_mask(out=out)
+
+def test_vec_engine_matches_engine_lockstep():
+    n = 8
+    vec = VecEngine(RULES, n)
+    engines = [Engine(RULES) for _ in range(n)]
+    rng = np.random.default_rng(3)
+    finished = 0
+    for _ in range(150):
+        masks = vec.legal_masks()
+        obs = vec.observe()
+        acts = np.empty(n, dtype=np.int64)
+        for i, e in enumerate(engines):
+            assert vec.cells[i].tobytes() == bytes(e.state.board.cells)
+            assert np.array_equal(masks[i], _mask(e))
+            assert np.array_equal(obs[i], e.observe(e.state.to_move))
+            # mostly legal moves, some out-of-mask indices to exercise the fallback
+            legal = np.flatnonzero(masks[i])
+            acts[i] = rng.integers(32768) if rng.random() < 0.1 else rng.choice(legal)
+        res = vec.step(acts)
+        for i, e in enumerate(engines):
+            a = index_action(int(acts[i]))
+            assert res.illegal[i] == (not e.is_legal(a))
+            if res.illegal[i]:
+                a = sorted(e.legal_actions())[0]
+            assert res.actions[i] == action_index(a)
+            e.apply(a)
+            assert res.final_cells[i].tobytes() == bytes(e.state.board.cells)
+            winner = e.winner_if_any()
+            if winner is None and not e.legal_actions():
+                winner = opponent(e.state.to_move)
+            expected = {None: NO_WINNER, "north": 0, "south": 1, "draw": 2}[winner]
+            assert res.winner[i] == expected
+            if winner is not None:
+                finished += 1
+                assert vec.move_count[i] == 0
+                engines[i] = Engine(RULES)
+    assert finished > 0
+
+def test_vec_engine_minimal_loss_rule():
+    # every north option is a losing melee; pikes are the cheapest to lose
+    board = Board(8, 8)
+    board.add_unit(4, 4, "R", "north")
+    board.add_unit(4, 0, "P", "north")
+    for c in (3, 4, 5):
+        board.add_unit(3, c, "R", "south")
+    for c in (0, 1):
+        board.add_unit(3, c, "P", "south")
+    state = GameState(board, "north")
+    engine = Engine(RULES)
+    engine.set_state(state.copy())
+    vec = VecEngine(RULES, 2, auto_reset=False)
+    vec.set_state(1, state)
+    assert np.array_equal(vec.legal_masks()[1], _mask(engine))
+    assert vec.n_legal[1] == 2
+    assert vec.get_state(1).to_bytes() == state.to_bytes()
+
+def test_vec_engine_start_pool():
+    engine = Engine(RULES)
+    starts = []
+    for a in [(6, 3, 0, 5, 3, 0), (1, 4, 0, 2, 4, 0), (6, 4, 0, 5, 4, 0)]:
+        engine.apply(a)
+        starts.append(engine.state.copy())
+    vec = VecEngine(RULES, 16, start_states=starts, start_weights=[0, 1, 1], seed=5)
+    assert {vec.get_state(i).to_bytes() for i in range(16)} == {s.to_bytes() for s in starts[1:]}
+    masks, n_legal, fallback = vec.legal_masks().copy(), vec.n_legal.copy(), vec._fallback.copy()
+    vec._refresh()
+    assert np.array_equal(masks, vec.legal_masks())
+    assert np.array_equal(n_legal, vec.n_legal) and np.array_equal(fallback, vec._fallback)
+    vec.set_start_states(None)
+    vec.reset([3])
+    assert vec.get_state(3).to_bytes() == Engine(RULES).state.to_bytes()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from implementation.age_of_chess.sb3_env import AOCSingleAgentSelfPlayEnv, AOCSelfPlayVectorEnv
+
+def test_vector_env_matches_single_env():
+    n = 4
+    venv = AOCSelfPlayVectorEnv("rulesets/default.yaml", num_envs=n)
+    envs = [AOCSingleAgentSelfPlayEnv("rulesets/default.yaml") for _ in range(n)]
+    obs, _ = venv.reset()
+    single = [e.reset()[0] for e in envs]
+    rng = np.random.default_rng(1)
+    for _ in range(60):
+        masks = venv.action_masks()
+        assert masks.shape == (n, venv.single_action_space.n)
+        for i, e in enumerate(envs):
+            assert np.array_equal(obs[i], single[i])
+            assert np.array_equal(masks[i], e.get_action_mask().astype(bool))
+        acts = np.array([rng.choice(np.flatnonzero(m)) for m in masks])
+        acts[0] = 0  # illegal: penalised and replaced by the first legal action
+        obs, rewards, term, trunc, infos = venv.step(acts)
+        assert infos["illegal_action"][0]
+        for i, e in enumerate(envs):
+            o, r, done, _, _ = e.step(int(acts[i]))
+            assert done == term[i]
+            if done:
+                single[i] = e.reset()[0]
+                assert infos["_final_obs"][i]
+            else:
+                assert np.isclose(r, rewards[i])
+                single[i] = o
+
+def test_sb3_vec_env_seeds_and_forwards_attributes():
+    pytest.importorskip("stable_baselines3")
+    from implementation.age_of_chess.sb3_env import AOCSelfPlaySB3VecEnv
+    env = AOCSelfPlaySB3VecEnv("rulesets/default.yaml", num_envs=3)
+    states = []
+    for seed in (7, 7, 8):
+        env.seed(seed)
+        env.reset()
+        states.append(env.env.engine.rng.bit_generator.state)
+    # the seed reaches the batched env, and is used for one reset only
+    assert states[0] == states[1] != states[2]
+    assert env._seeds == [None] * 3
+    assert env.get_attr("num_envs") == [3, 3, 3] and env.get_attr("action_encoding", 1) == ["flat"]
+    env.set_attr("marker", 5)
+    assert env.env.marker == 5
+    masks = env.env_method("action_masks", indices=[0, 2])
+    assert len(masks) == 2 and masks[0].any()
+    env.close()
@@ -0,0 +1,44 @@
+from implementation.age_of_chess.env import Engine
+from implementation.age_of_chess.transposition import TranspositionTable, LOWER
+from implementation.age_of_chess.agents import SearchAgent
+
+def test_hash_tracks_position():
+    engine = Engine("rulesets/default.yaml", debug=True)
+    start = engine.hash
+    # Two move orders reaching the same position hash the same.
+    a1, a2 = (6, 0, 0, 5, 0, 0), (6, 7, 0, 5, 7, 0)
+    b1, b2 = (1, 0, 0, 2, 0, 0), (1, 7, 0, 2, 7, 0)
+    recs = [engine.apply(a) for a in (a1, b1, a2, b2)]
+    h = engine.hash
+    for rec in reversed(recs):
+        engine.undo(rec)
+    assert engine.hash == start
+    for a in (a2, b2, a1, b1):
+        engine.apply(a)
+    assert engine.hash == h != start
+
+def test_transposition_table_replacement():
+    tt = TranspositionTable(bits=2)
+    tt.put(1, depth=3, value=10)
+    tt.put(5, depth=1, value=20, flag=LOWER)  # same bucket, shallower: kept alongside
+    assert tt.get(1).value == 10 and tt.get(5).flag == LOWER
+    assert tt.get(9) is None
+    assert tt.stats()["hits"] == 2 and tt.stats()["misses"] == 1
+    assert len(tt) == 2
+
+def test_transposition_table_clear():
+    tt = TranspositionTable(bits=2)
+    tt.put(1, depth=3, value=10)
+    tt.get(1)
+    tt.clear(counters=False)
+    assert len(tt) == 0 and tt.get(1) is None
+    assert tt.stats()["hits"] == 1 and tt.stats()["stores"] == 1
+    tt.clear()
+    assert tt.stats()["hits"] == tt.stats()["misses"] == tt.stats()["stores"] == 0
+    # a search that does not reuse the table still reports cumulative counters
+    engine = Engine("rulesets/default.yaml")
+    agent = SearchAgent(max_depth=2, time_limit=None, reuse_tt=False)
+    agent.select(engine)
+    stores = agent.stats["tt"]["stores"]
+    agent.select(engine)
+    assert agent.stats["tt"]["stores"] == 2 * stores > 0